@@ -50,7 +50,7 @@ class UserProfileView(APIView):
     def get(self, request):
         serializer = UserSerializer(request.user, context={"request": request})
         user_courses = UserCourse.objects.filter(user=request.user).select_related(
-            "course"
+            "course", "progress"
         )
 
         progress_data = [
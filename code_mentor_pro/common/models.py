@@ -7,3 +7,45 @@ class SimpleBaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class StatusTrackingMixin(models.Model):
+    """
+    Запоминает статус (поле status_field), загруженный из БД, и при save()
+    выставляет status_transition = (прежний, новый), если статус изменился
+    (для новой записи прежний — None). Обработчики post_save видят переход.
+    """
+
+    status_field = "status"
+    status_transition = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get(cls.status_field)
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._saved_status = self.__dict__.get(self.status_field)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.status_field not in update_fields:
+            self.status_transition = None
+            super().save(*args, **kwargs)
+            return
+
+        previous = getattr(self, "_saved_status", None)
+        current = getattr(self, self.status_field)
+        self.status_transition = (previous, current) if previous != current else None
+        super().save(*args, **kwargs)
+        self._saved_status = current
+
+    def has_transitioned_to(self, status):
+        return (
+            self.status_transition is not None and self.status_transition[1] == status
+        )
@@ -4,10 +4,14 @@ from rest_framework.routers import DefaultRouter, SimpleRouter
 
 from code_mentor_pro.users.api.views import RegistrationView, UserProfileView
 from courses.api.views import (CompleteMaterialView, CourseDetailView,
-                               CourseViewSet, LessonDetailView,
-                               SaveSurveyAnswersView,
+                               CourseProgressExportView, CourseViewSet,
+                               LeaderboardAroundMeView, LeaderboardTopView,
+                               LessonDetailView,
+                               SaveSurveyAnswersView, SearchView,
+                               UserAchievementFeedView,
                                UserAchievementsDetailView,
-                               UserProgressDetailView)
+                               UserLearningEventsView,
+                               UserProgressDetailView, UserStreakView)
 
 router = DefaultRouter() if settings.DEBUG else SimpleRouter()
 
@@ -17,14 +21,37 @@ urlpatterns = router.urls + [
     path("auth/register/", RegistrationView.as_view(), name="user-register"),
     path("users/profile/", UserProfileView.as_view(), name="user-profile"),
     path("users/progress", UserProgressDetailView.as_view(), name="user-progress"),
+    path("users/events", UserLearningEventsView.as_view(), name="user-events"),
+    path("users/streak", UserStreakView.as_view(), name="user-streak"),
     path(
         "users/achievements",
         UserAchievementsDetailView.as_view(),
         name="user-achievements",
     ),
+    path(
+        "users/achievements/feed",
+        UserAchievementFeedView.as_view(),
+        name="user-achievement-feed",
+    ),
+    path(
+        "leaderboards/<slug:metric>",
+        LeaderboardTopView.as_view(),
+        name="leaderboard-top",
+    ),
+    path(
+        "leaderboards/<slug:metric>/me",
+        LeaderboardAroundMeView.as_view(),
+        name="leaderboard-around-me",
+    ),
+    path("search", SearchView.as_view(), name="search"),
     # КУРСЫ
     path("courses/", CourseViewSet.as_view({"get": "list"}), name="course-list"),
     path("courses/<slug:slug>/", CourseDetailView.as_view(), name="course-detail"),
+    path(
+        "courses/<slug:course_slug>/progress/export",
+        CourseProgressExportView.as_view(),
+        name="course-progress-export",
+    ),
     path(
         "courses/<slug:course_slug>/lessons/<int:lesson_id>/",
         LessonDetailView.as_view(),
@@ -0,0 +1,26 @@
+"""
+ASGI config for code_mentor_pro project.
+
+Serves the same Django application as ``config.wsgi`` but lets long-lived
+streaming responses (the ``users/events`` Server-Sent Events endpoint) wait
+for Redis pub/sub messages without tying up a worker thread. Streaming
+responses served here must use async iterators (see the course progress
+export), otherwise Django reads them into memory first. Run it with e.g.::
+
+    gunicorn config.asgi -k uvicorn_worker.UvicornWorker
+
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+
+# This allows easy placement of apps within the interior
+# code_mentor_pro directory.
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+sys.path.append(str(BASE_DIR / "code_mentor_pro"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.production")
+
+application = get_asgi_application()
@@ -1,10 +1,12 @@
 from django.contrib import admin
 
-from courses.models import (Achievement, AnswerOption, Course, Lesson,
-                            Material, Module, Question, Survey,
-                            UserAchievement, UserAnswer, UserCourse,
-                            UserCourseLesson, UserCourseLessonMaterial,
+from courses.models import (SQL_METRICS, Achievement, AchievementAwardJob,
+                            AnswerOption, Course, Lesson, Material, Module,
+                            Question, Survey, UserAchievement, UserAnswer,
+                            UserCourse, UserCourseLesson,
+                            UserCourseLessonMaterial, UserCourseProgress,
                             UserCourseSurvey)
+from courses.tasks import start_achievement_award_job
 
 
 @admin.register(Course)
@@ -59,6 +61,12 @@ class MaterialAdmin(admin.ModelAdmin): ...
 class UserCourseAdmin(admin.ModelAdmin): ...
 
 
+@admin.register(UserCourseProgress)
+class UserCourseProgressAdmin(admin.ModelAdmin):
+    list_display = ("user_course", *UserCourseProgress.COUNTER_FIELDS, "updated_at")
+    raw_id_fields = ("user_course",)
+
+
 @admin.register(UserCourseLesson)
 class UserCourseLessonAdmin(admin.ModelAdmin): ...
 
@@ -115,8 +123,55 @@ class UserAnswerAdmin(admin.ModelAdmin):
     search_fields = ("user_survey__user__username", "question__text")
 
 
+class AchievementAwardJobInline(admin.TabularInline):
+    model = AchievementAwardJob
+    extra = 0
+    can_delete = False
+    fields = readonly_fields = (
+        "status",
+        "awarded_count",
+        "last_user_id",
+        "created_at",
+        "finished_at",
+        "error",
+    )
+    ordering = ["-created_at"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Achievement)
-class AchievementAdmin(admin.ModelAdmin): ...
+class AchievementAdmin(admin.ModelAdmin):
+    list_display = ["title", "code", "metric", "threshold", "is_active"]
+    list_filter = ["metric", "is_active"]
+    inlines = [AchievementAwardJobInline]
+    actions = ["award_retroactively"]
+
+    @admin.action(description="Выдать задним числом всем выполнившим условие")
+    def award_retroactively(self, request, queryset):
+        for achievement in queryset.filter(is_active=True, metric__in=SQL_METRICS):
+            start_achievement_award_job(achievement)
+
+
+@admin.register(AchievementAwardJob)
+class AchievementAwardJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "achievement",
+        "status",
+        "awarded_count",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status"]
+    readonly_fields = [
+        "achievement",
+        "status",
+        "awarded_count",
+        "last_user_id",
+        "finished_at",
+        "error",
+    ]
 
 
 @admin.register(UserAchievement)
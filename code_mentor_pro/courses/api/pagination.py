@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CourseCursorPagination(CursorPagination):
+    """
+    Каталог курсов по курсору: позиция кодируется неизменяемым pk,
+    поэтому страницы не съезжают при добавлении курсов.
+    """
+
+    ordering = "pk"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        # Ссылки на соседние страницы — от адреса без посторонних параметров,
+        # как и ключ кэша страницы (CourseViewSet.get_catalog_url)
+        if hasattr(view, "get_catalog_url"):
+            self.base_url = view.get_catalog_url()
+        return page
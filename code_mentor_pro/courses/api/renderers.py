@@ -0,0 +1,19 @@
+from rest_framework.renderers import BaseRenderer
+
+from courses.events import format_event
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Согласование Accept: text/event-stream для потоковых ответов. Кадры
+    событий пишет StreamingHttpResponse, здесь рендерятся только ошибки.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return format_event("error", data).encode(self.charset)
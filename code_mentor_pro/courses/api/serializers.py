@@ -1,54 +1,121 @@
 from random import shuffle
 
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from courses.models import (Achievement, AnswerOption, Course, Lesson,
                             Material, Module, Question, Survey,
-                            UserAchievement, UserAnswer, UserCourseLesson,
-                            UserCourseLessonMaterial, UserCourseSurvey)
-
-
-class CourseSerializer(serializers.ModelSerializer):
+                            UserAchievement, UserAnswer,
+                            UserCourseLessonMaterial, UserCourseSurvey,
+                            get_awarded_achievement_ids)
+from courses.models.structure import get_course_structure
+
+
+def parse_fieldset(value):
+    """
+    Список полей из параметра запроса ("id,title,surveys.title") в дерево
+    {"id": {}, "title": {}, "surveys": {"title": {}}}; None, если не задан.
+    """
+    if not value:
+        return None
+    tree: dict[str, dict] = {}
+    for path in value.split(","):
+        node: dict[str, dict] = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def get_sparse_fieldset(request):
+    """
+    Выборка полей по ?fields= (только перечисленные) и ?omit= (все, кроме
+    перечисленных) — аргументы сериализаторов с SparseFieldsetMixin.
+    """
+    return {
+        "fields": parse_fieldset(request.query_params.get("fields")),
+        "omit": parse_fieldset(request.query_params.get("omit")),
+    }
+
+
+def is_field_selected(fieldset, name):
+    # Поле из omit исключается целиком, только если не указаны его вложенные поля
+    return (fieldset["fields"] is None or name in fieldset["fields"]) and (
+        fieldset["omit"] or {}
+    ).get(name) != {}
+
+
+class SparseFieldsetMixin(serializers.Serializer):
+    """
+    Сериализует только поля из выборки get_sparse_fieldset. Остальные
+    удаляются до сериализации, поэтому их методы, вложенные сериализаторы
+    и запросы не выполняются. Выборка вложенных полей (через точку)
+    передаётся вложенным сериализаторам.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fieldset = {"fields": fields, "omit": omit}
+
+    def get_nested_fieldset(self, name):
+        return {
+            key: (selection or {}).get(name) or None
+            for key, selection in self.fieldset.items()
+        }
+
+    def get_fields(self):
+        fields = {
+            name: field
+            for name, field in super().get_fields().items()
+            if is_field_selected(self.fieldset, name)
+        }
+        for name, field in fields.items():
+            nested = getattr(field, "child", field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested.fieldset = self.get_nested_fieldset(name)
+        return fields
+
+
+class CourseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = "__all__"
+        exclude = ["search_vector"]
 
 
-class CourseSerializerForAuthUser(serializers.ModelSerializer):
-    is_enrolled = serializers.SerializerMethodField()
+class CourseSerializerForAuthUser(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Из Course.objects.with_is_enrolled(user), без запроса на каждый курс
+    is_enrolled = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Course
-        fields = "__all__"
+        exclude = ["search_vector"]
 
-    def get_is_enrolled(self, obj):
-        user = self.context["request"].user
-        if user.is_authenticated:
-            return user.user_courses.filter(course=obj).exists()
-        return False
 
+class LessonSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Урок из снимка структуры курса (dict), статус и завершённость берутся
+    из context["lesson_statuses"] и context["completed_lesson_ids"].
+    """
 
-class LessonSerializer(serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
+    is_completed = serializers.SerializerMethodField()
 
     class Meta:
         model = Lesson
-        fields = ["id", "title", "description", "order", "status"]
+        fields = ["id", "title", "description", "order", "status", "is_completed"]
 
     def get_status(self, obj):
-        if self.context and "request" in self.context:
-            request = self.context["request"]
-            user = request.user
-            if user and user.is_authenticated:
-                user_course_lesson = UserCourseLesson.objects.filter(
-                    user_course__user=user, lesson=obj
-                ).first()
-                if user_course_lesson:
-                    return user_course_lesson.status
-        return None
+        return self.context.get("lesson_statuses", {}).get(obj["id"])
+
+    def get_is_completed(self, obj) -> bool:
+        return obj["id"] in self.context.get("completed_lesson_ids", ())
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Модуль из снимка структуры курса (dict).
+    """
+
     lessons = LessonSerializer(many=True, read_only=True)
 
     class Meta:
@@ -56,8 +123,8 @@ class ModuleSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "description", "order", "lessons"]
 
 
-class CourseDetailSerializer(serializers.ModelSerializer):
-    modules = ModuleSerializer(many=True, read_only=True)
+class CourseDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    modules = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
@@ -75,8 +142,18 @@ class CourseDetailSerializer(serializers.ModelSerializer):
             "modules",
         ]
 
+    @extend_schema_field(ModuleSerializer(many=True))
+    def get_modules(self, obj):
+        structure = self.context.get("structure") or get_course_structure(obj.pk)
+        return ModuleSerializer(
+            structure.modules,
+            many=True,
+            context=self.context,
+            **self.get_nested_fieldset("modules"),
+        ).data
+
 
-class MaterialSerializer(serializers.ModelSerializer):
+class MaterialSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     status = serializers.SerializerMethodField()
 
     class Meta:
@@ -105,7 +182,7 @@ class MaterialSerializer(serializers.ModelSerializer):
                     return user_course_lesson_material.status
 
 
-class AnswerOptionSerializer(serializers.ModelSerializer):
+class AnswerOptionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     selected_before = serializers.SerializerMethodField()
 
     class Meta:
@@ -122,7 +199,7 @@ class AnswerOptionSerializer(serializers.ModelSerializer):
         return False
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     options = serializers.SerializerMethodField()
     status = serializers.SerializerMethodField()
 
@@ -145,10 +222,15 @@ class QuestionSerializer(serializers.ModelSerializer):
         options = list(obj.options.all())
         shuffle(options)
 
-        return AnswerOptionSerializer(options, many=True, context=self.context).data
+        return AnswerOptionSerializer(
+            options,
+            many=True,
+            context=self.context,
+            **self.get_nested_fieldset("options"),
+        ).data
 
 
-class SurveySerializer(serializers.ModelSerializer):
+class SurveySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     questions = serializers.SerializerMethodField()
     status = serializers.SerializerMethodField()
 
@@ -172,10 +254,15 @@ class SurveySerializer(serializers.ModelSerializer):
         questions = list(obj.questions.all())
         shuffle(questions)
 
-        return QuestionSerializer(questions, many=True, context=self.context).data
+        return QuestionSerializer(
+            questions,
+            many=True,
+            context=self.context,
+            **self.get_nested_fieldset("questions"),
+        ).data
 
 
-class LessonDetailSerializer(serializers.ModelSerializer):
+class LessonDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     materials = MaterialSerializer(many=True, read_only=True)
     surveys = SurveySerializer(many=True, read_only=True)
 
@@ -191,35 +278,41 @@ class CourseProgressSerializer(serializers.Serializer):
     progress_percent = serializers.IntegerField()
 
 
-class AchievementShortSerializer(serializers.ModelSerializer):
-    awarded = serializers.SerializerMethodField()
+class AwardedAchievementMixin(SparseFieldsetMixin, serializers.Serializer):
+    """
+    Поле awarded по закэшированному множеству выданных пользователю
+    достижений: одно обращение к кэшу на весь список, без запросов на строку.
+    """
 
-    class Meta:
-        model = Achievement
-        fields = ["id", "title", "icon", "awarded"]
+    awarded = serializers.SerializerMethodField()
 
     def get_awarded(self, obj):
         if self.context and "request" in self.context:
             user = self.context["request"].user
             if user and user.is_authenticated:
-                return UserAchievement.objects.filter(
-                    user=user, achievement=obj
-                ).exists()
+                if "awarded_achievement_ids" not in self.context:
+                    self.context["awarded_achievement_ids"] = (
+                        get_awarded_achievement_ids(user.pk)
+                    )
+                return obj.pk in self.context["awarded_achievement_ids"]
         return False
 
 
-class AchievementFullSerializer(serializers.ModelSerializer):
-    awarded = serializers.SerializerMethodField()
+class AchievementShortSerializer(AwardedAchievementMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Achievement
+        fields = ["id", "title", "icon", "awarded"]
 
+
+class AchievementFullSerializer(AwardedAchievementMixin, serializers.ModelSerializer):
     class Meta:
         model = Achievement
         fields = ["id", "title", "icon", "description", "awarded"]
 
-    def get_awarded(self, obj):
-        if self.context and "request" in self.context:
-            user = self.context["request"].user
-            if user and user.is_authenticated:
-                return UserAchievement.objects.filter(
-                    user=user, achievement=obj
-                ).exists()
-        return False
+
+class UserAchievementFeedSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    achievement = AchievementFullSerializer()
+
+    class Meta:
+        model = UserAchievement
+        fields = ["id", "achievement", "awarded_at"]
@@ -1,80 +1,298 @@
-from django.db.models import Prefetch
+import hashlib
+import json
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from courses.models import (Achievement, AnswerOption, Course, Lesson,
-                            Material, Module, Question, Survey, UserAnswer,
-                            UserCourse, UserCourseLesson,
-                            UserCourseLessonMaterial, UserCourseSurvey)
-
+                            Material, Question, Survey, UserAchievement,
+                            UserAnswer, UserCourse, UserCourseLesson,
+                            UserCourseLessonMaterial, UserCourseProgress,
+                            UserCourseSurvey)
+from courses.events import stream_learning_events
+from courses.export import (EXPORT_RENDERERS, aiter_in_chunks,
+                            iter_course_progress_rows)
+from courses.leaderboards import (COURSE_LEADERBOARD_METRICS,
+                                  LEADERBOARD_METRICS, get_around, get_top)
+from courses.models.structure import get_course_structure
+from courses.models.search import search_learning_content
+from courses.models.versions import (get_achievements_etag,
+                                     get_catalog_version,
+                                     get_learning_progress_etag)
+from courses.streaks import get_users_streaks
+
+from .pagination import CourseCursorPagination
+from .renderers import EventStreamRenderer
 from .serializers import (AchievementFullSerializer, CourseDetailSerializer,
                           CourseSerializer, CourseSerializerForAuthUser,
-                          LessonDetailSerializer, SurveySerializer)
+                          LessonDetailSerializer, SurveySerializer,
+                          UserAchievementFeedSerializer, get_sparse_fieldset,
+                          is_field_selected)
+
+CATALOG_PAGE_KEY = "courses:catalog:{version}:{url}"
+
+
+class StreamingUnavailable(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = "Поток событий доступен только при запуске через ASGI"
+    default_code = "streaming_unavailable"
+
+
+def get_structure_lesson_or_404(structure, lesson_id):
+    lesson = structure.get_lesson(lesson_id)
+    if lesson is None:
+        raise Http404
+    return lesson
+
+
+def get_int_param(request, name, default, max_value):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or not 0 < int(value) <= max_value:
+        raise ValidationError({name: f"Ожидается число от 1 до {max_value}"})
+    return int(value)
+
+
+def learning_progress_etag(request, *args, **kwargs):
+    return get_learning_progress_etag(request.user.pk)
+
+
+def achievements_etag(request, *args, **kwargs):
+    return get_achievements_etag(request.user.pk)
 
 
 class CourseViewSet(ReadOnlyModelViewSet):
-    queryset = Course.objects.filter(is_published=True)
+    queryset = Course.objects.published()
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
+    pagination_class = CourseCursorPagination
+    catalog_cache_timeout = 60 * 60
+    # Фильтры каталога: ?level=, ?programming_language=, ?certificate_available=
+    catalog_facets: dict[str, dict[str, object]] = {
+        "level": {value: value for value, _ in Course.LEVEL_CHOICES},
+        "programming_language": {value: value for value, _ in Course.LANGUAGE_CHOICES},
+        "certificate_available": {"true": True, "false": False},
+    }
+
+    def get_queryset(self):
+        # is_enrolled для CourseSerializerForAuthUser; закэшированная страница
+        # каталога строится без него (get_catalog_page_content)
+        if self.request.user.is_authenticated:
+            return Course.objects.published().with_is_enrolled(self.request.user)
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.request.user.is_authenticated:
+            return CourseSerializerForAuthUser
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(
+            *args, **get_sparse_fieldset(self.request), **kwargs
+        )
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+    def get_catalog_fieldset(self):
+        # is_enrolled добавляется к закэшированной странице по id курса
+        fieldset = get_sparse_fieldset(self.request)
+        if fieldset["fields"] is not None and "is_enrolled" in fieldset["fields"]:
+            fieldset["fields"]["id"] = {}
+        return fieldset
+
+    def get_catalog_url(self):
+        """
+        Абсолютный адрес страницы каталога только с известными параметрами
+        (курсор, размер страницы, фильтры, выборка полей): посторонние
+        параметры не создают новых страниц в кэше.
+        """
+        known_params = {
+            CourseCursorPagination.cursor_query_param,
+            CourseCursorPagination.page_size_query_param,
+            *self.catalog_facets,
+            "fields",
+            "omit",
+        }
+        params = sorted(
+            (name, value)
+            for name, value in self.request.query_params.items()
+            if name in known_params
+        )
+        path = self.request.path
+        return self.request.build_absolute_uri(
+            f"{path}?{urlencode(params)}" if params else path
+        )
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+    def get_catalog_filters(self):
+        filters = {}
+        for name, choices in self.catalog_facets.items():
+            value = self.request.query_params.get(name)
+            if value is None:
+                continue
+            if value not in choices:
+                raise ValidationError({name: f"Неизвестное значение: {value}"})
+            filters[name] = choices[value]
+        return filters
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list":
+            queryset = queryset.filter(**self.get_catalog_filters())
+        return queryset
+
+    def get_paginated_response(self, data):
+        """
+        Рядом со страницей — количество курсов по значениям фильтров с учётом
+        остальных выбранных фильтров, одним сгруппированным запросом.
+        """
+        response = super().get_paginated_response(data)
+        response.data["facets"] = Course.objects.published().facet_counts(
+            list(self.catalog_facets), self.get_catalog_filters()
+        )
+        return response
 
-        if request.user and request.user.is_authenticated:
-            serializer = CourseSerializerForAuthUser(
-                queryset, many=True, context={"request": request}
+    def list(self, request, *args, **kwargs):
+        """
+        Страница каталога одинакова для всех анонимных пользователей, поэтому
+        отрендеренный JSON кэшируется под версией каталога (меняется при
+        сохранении и удалении курса). Авторизованным к той же странице
+        добавляется is_enrolled одним запросом.
+        """
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        content = self.get_catalog_page_content()
+        if not request.user.is_authenticated or not is_field_selected(
+            self.get_catalog_fieldset(), "is_enrolled"
+        ):
+            return HttpResponse(content, content_type="application/json")
+
+        data = json.loads(content)
+        enrolled = dict(
+            Course.objects.filter(pk__in=[course["id"] for course in data["results"]])
+            .with_is_enrolled(request.user)
+            .values_list("pk", "is_enrolled")
+        )
+        for course in data["results"]:
+            course["is_enrolled"] = enrolled.get(course["id"], False)
+        return Response(data)
+
+    def get_catalog_page_content(self):
+        # Ссылки на логотипы и соседние страницы абсолютные, поэтому ключ —
+        # адрес запроса вместе с хостом
+        url = self.get_catalog_url()
+        key = CATALOG_PAGE_KEY.format(
+            version=get_catalog_version(),
+            url=hashlib.md5(url.encode(), usedforsecurity=False).hexdigest(),
+        )
+        content = cache.get(key)
+        if content is None:
+            # Общая для всех страница: без is_enrolled текущего пользователя
+            page = self.paginate_queryset(self.filter_queryset(super().get_queryset()))
+            serializer = CourseSerializer(
+                page,
+                many=True,
+                context=self.get_serializer_context(),
+                **self.get_catalog_fieldset(),
             )
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            content = JSONRenderer().render(
+                self.get_paginated_response(serializer.data).data
+            )
+            cache.set(key, content, self.catalog_cache_timeout)
+        return content
+
+
+class SearchView(APIView):
+    """
+    Полнотекстовый поиск по курсам, урокам и материалам, по убыванию
+    релевантности. ?q= — запрос; ?level=, ?programming_language= — фильтры
+    курса; ?language= — язык материалов.
+    """
+
+    permission_classes = [AllowAny]
+    filter_choices = {
+        "level": Course.LEVEL_CHOICES,
+        "programming_language": Course.LANGUAGE_CHOICES,
+        "language": Material.LANGUAGE_CHOICES,
+    }
+
+    def get(self, request):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "Введите поисковый запрос"})
+
+        filters = {}
+        for name, choices in self.filter_choices.items():
+            value = request.query_params.get(name)
+            if value is None:
+                continue
+            if value not in dict(choices):
+                raise ValidationError({name: f"Неизвестное значение: {value}"})
+            filters[name] = value
+
+        return Response(
+            search_learning_content(text, **filters), status=status.HTTP_200_OK
+        )
 
 
 class CourseDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug):
-        course = get_object_or_404(
-            Course.objects.prefetch_related(
-                Prefetch(
-                    "modules",
-                    queryset=Module.objects.order_by("order").prefetch_related(
-                        Prefetch("lessons", queryset=Lesson.objects.order_by("order"))
-                    ),
-                )
-            ),
-            slug=slug,
-        )
+        course = get_object_or_404(Course, slug=slug)
+        structure = get_course_structure(course.pk)
 
+        lesson_statuses = {}
+        completed_lesson_ids = set()
+        progress_details = None
         if request.user and request.user.is_authenticated:
-            user_course_lessons = []
+            # При входе на курс - зачисляем пользователя
             user_course = course.enroll_user(request.user)
-            for module in course.modules.all():
-                for lesson in module.lessons.all():
-                    if not UserCourseLesson.objects.filter(
-                        user_course=user_course, lesson=lesson
-                    ).exists():
-                        _lesson = UserCourseLesson(
-                            user_course=user_course, lesson=lesson
-                        )
-                        user_course_lessons.append(_lesson)
+            lesson_statuses = dict(
+                UserCourseLesson.objects.filter(user_course=user_course).values_list(
+                    "lesson_id", "status"
+                )
+            )
+            user_course_lessons = [
+                UserCourseLesson(user_course=user_course, lesson_id=lesson["id"])
+                for lesson in structure.lessons
+                if lesson["id"] not in lesson_statuses
+            ]
             if user_course_lessons:
                 UserCourseLesson.objects.bulk_create(user_course_lessons)
+                lesson_statuses.update(
+                    (_lesson.lesson_id, _lesson.status)
+                    for _lesson in user_course_lessons
+                )
 
-            # При входе на курс - зачисляем пользователя
-            course.enroll_user(request.user)
-
-        serializer = CourseDetailSerializer(course, context={"request": request})
-        return Response({"course": serializer.data})
+            # Завершённые уроки и прогресс — из битовых карт, без выборки
+            # опросов пользователя
+            progress = UserCourseProgress.objects.get_current(user_course, structure)
+            completed_lesson_ids = progress.get_completed_lesson_ids(structure)
+            progress_details = progress.get_progress_details()
+
+        serializer = CourseDetailSerializer(
+            course,
+            context={
+                "request": request,
+                "structure": structure,
+                "lesson_statuses": lesson_statuses,
+                "completed_lesson_ids": completed_lesson_ids,
+            },
+            **get_sparse_fieldset(request),
+        )
+        return Response({"course": serializer.data, "progress": progress_details})
 
 
 class LessonDetailView(APIView):
@@ -82,11 +300,11 @@ class LessonDetailView(APIView):
 
     def get(self, request, course_slug, lesson_id):
         course = get_object_or_404(Course, slug=course_slug)
-        lesson = get_object_or_404(
-            Lesson.objects.prefetch_related("materials"),
-            id=lesson_id,
-            module__course=course,
-        )
+        fieldset = get_sparse_fieldset(request)
+        lessons = Lesson.objects.all()
+        if is_field_selected(fieldset, "materials"):
+            lessons = lessons.prefetch_related("materials")
+        lesson = get_object_or_404(lessons, id=lesson_id, module__course=course)
         user_course = course.enroll_user(request.user)
 
         # Создаем связку юзер - урок
@@ -101,20 +319,24 @@ class LessonDetailView(APIView):
             user_course_lesson.save()
 
         # Создаем связку юзер - урок - материал
-        user_course_lessons_materials = []
-        for material in lesson.materials.all():
-            if not UserCourseLessonMaterial.objects.filter(
-                user_course_lesson=user_course_lesson, material=material
-            ).exists():
-                _material = UserCourseLessonMaterial(
-                    user_course_lesson=user_course_lesson, material=material
-                )
-                user_course_lessons_materials.append(_material)
+        existing_material_ids = set(
+            UserCourseLessonMaterial.objects.filter(
+                user_course_lesson=user_course_lesson
+            ).values_list("material_id", flat=True)
+        )
+        user_course_lessons_materials = [
+            UserCourseLessonMaterial(
+                user_course_lesson=user_course_lesson, material_id=material_id
+            )
+            for material_id in get_course_structure(course.pk)
+            .get_lesson(lesson.pk)["material_ids"]
+            if material_id not in existing_material_ids
+        ]
         if user_course_lessons_materials:
             UserCourseLessonMaterial.objects.bulk_create(user_course_lessons_materials)
 
         serializer = LessonDetailSerializer(
-            lesson, context={"request": request, "lesson": lesson}
+            lesson, context={"request": request, "lesson": lesson}, **fieldset
         )
         return Response({"lesson": serializer.data}, status=status.HTTP_200_OK)
 
@@ -125,21 +347,22 @@ class CompleteMaterialView(APIView):
     def post(self, request, course_slug, lesson_id, material_id):
         # 1. Проверяем существование курса, урока и материала
         course = get_object_or_404(Course, slug=course_slug)
-        lesson = get_object_or_404(Lesson, id=lesson_id, module__course=course)
-        material = get_object_or_404(Material, id=material_id, lesson=lesson)
+        lesson = get_structure_lesson_or_404(get_course_structure(course.pk), lesson_id)
+        if material_id not in lesson["material_ids"]:
+            raise Http404
 
         # 2. Получаем или создаем user_course
         user_course = course.enroll_user(request.user)
 
         # 3. Получаем или создаем user_course_lesson
         user_course_lesson, _ = UserCourseLesson.objects.get_or_create(
-            user_course=user_course, lesson=lesson
+            user_course=user_course, lesson_id=lesson_id
         )
 
         # 4. Получаем или создаем user_course_lesson_material
         uclm, _ = UserCourseLessonMaterial.objects.get_or_create(
             user_course_lesson=user_course_lesson,
-            material=material,
+            material_id=material_id,
         )
 
         # 5. Меняем статус
@@ -163,8 +386,10 @@ class SaveSurveyAnswersView(APIView):
         user = request.user
 
         course = get_object_or_404(Course, slug=course_slug)
-        lesson = get_object_or_404(Lesson, id=lesson_id, module__course=course)
-        survey = get_object_or_404(Survey, id=survey_id, lessons__id=lesson.id)
+        lesson = get_structure_lesson_or_404(get_course_structure(course.pk), lesson_id)
+        if survey_id not in lesson["survey_ids"]:
+            raise Http404
+        survey = get_object_or_404(Survey, id=survey_id)
 
         user_course = UserCourse.objects.filter(course=course, user=user).first()
         if not user_course:
@@ -225,20 +450,23 @@ class SaveSurveyAnswersView(APIView):
 
         # ⬇️ Обновление статуса урока
         user_course_lesson, _ = UserCourseLesson.objects.get_or_create(
-            user_course=user_course, lesson=lesson
+            user_course=user_course, lesson_id=lesson_id
         )
 
-        lesson_surveys = lesson.surveys.all()
-        if not lesson_surveys.exists():
+        lesson_survey_ids = lesson["survey_ids"]
+        previous_status = user_course_lesson.status
+        if not lesson_survey_ids:
             # если нет опросов вообще — считаем завершенным
             user_course_lesson.status = UserCourseLesson.STATUS_COMPLETED
         else:
             # получаем все user-связки для опросов этого урока
-            user_surveys = UserCourseSurvey.objects.filter(
-                user_course=user_course, survey__in=lesson_surveys
+            user_surveys = list(
+                UserCourseSurvey.objects.filter(
+                    user_course=user_course, survey_id__in=lesson_survey_ids
+                )
             )
 
-            if user_surveys.count() < lesson_surveys.count():
+            if len(user_surveys) < len(lesson_survey_ids):
                 # пользователь еще не ответил на все опросы
                 user_course_lesson.status = UserCourseLesson.STATUS_IN_PROGRESS
             elif all(
@@ -248,18 +476,24 @@ class SaveSurveyAnswersView(APIView):
             else:
                 user_course_lesson.status = UserCourseLesson.STATUS_IN_PROGRESS
 
-        user_course_lesson.save()
+        if user_course_lesson.status != previous_status:
+            user_course_lesson.save(update_fields=["status", "updated_at"])
 
-        survey_data = SurveySerializer(survey, context={"request": self.request}).data
+        survey_data = SurveySerializer(
+            survey, context={"request": request}, **get_sparse_fieldset(request)
+        ).data
         return Response(survey_data, status=status.HTTP_200_OK)
 
 
 class UserProgressDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(condition(etag_func=learning_progress_etag))
     def get(self, request):
         user = request.user
-        user_courses = UserCourse.objects.select_related("course").filter(user=user)
+        user_courses = UserCourse.objects.select_related("course", "progress").filter(
+            user=user
+        )
 
         progress_data = []
         for user_course in user_courses:
@@ -277,16 +511,182 @@ class UserProgressDetailView(APIView):
         return Response({"progress": progress_data}, status=status.HTTP_200_OK)
 
 
+class UserStreakView(APIView):
+    """
+    Текущая и самая длинная серии дней активности пользователя.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        streaks = get_users_streaks([request.user.pk])[request.user.pk]
+        return Response(streaks, status=status.HTTP_200_OK)
+
+
+class CourseProgressExportView(APIView):
+    """
+    Потоковая выгрузка статусов уроков и опросов всех учеников курса
+    (?output=ndjson или csv).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, course_slug):
+        course = get_object_or_404(Course, slug=course_slug)
+        output = request.query_params.get("output", "ndjson")
+        if output not in EXPORT_RENDERERS:
+            available = ", ".join(EXPORT_RENDERERS)
+            raise ValidationError({"output": f"Доступные форматы: {available}"})
+
+        content_type, render = EXPORT_RENDERERS[output]
+        content = render(iter_course_progress_rows(course))
+        if hasattr(request, "scope"):
+            # Под ASGI синхронный поток был бы собран в память целиком
+            content = aiter_in_chunks(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="{course.slug}-progress.{output}"'
+        )
+        return response
+
+
 class UserAchievementsDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(condition(etag_func=achievements_etag))
     def get(self, request):
         achievments = Achievement.objects.filter(is_active=True)
         return Response(
             {
                 "achievements": AchievementFullSerializer(
-                    achievments, many=True, context={"request": request}
+                    achievments,
+                    many=True,
+                    context={"request": request},
+                    **get_sparse_fieldset(request),
+                ).data
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class UserAchievementFeedView(APIView):
+    """
+    Лента доставленных уведомлений о достижениях пользователя, новые первыми.
+    ?after=<id> — только уведомления новее указанного (для опроса клиентом).
+    """
+
+    permission_classes = [IsAuthenticated]
+    feed_limit = 20
+
+    def get(self, request):
+        after = request.query_params.get("after", "0")
+        if not after.isdigit():
+            raise ValidationError({"after": "Ожидается id уведомления"})
+
+        awards = (
+            UserAchievement.objects.filter(
+                user=request.user, is_notified=True, pk__gt=int(after)
+            )
+            .select_related("achievement")
+            .order_by("-pk")[: self.feed_limit]
+        )
+        return Response(
+            {
+                "notifications": UserAchievementFeedSerializer(
+                    awards,
+                    many=True,
+                    context={"request": request},
+                    **get_sparse_fieldset(request),
                 ).data
             },
             status=status.HTTP_200_OK,
         )
+
+
+class UserLearningEventsView(APIView):
+    """
+    Поток Server-Sent Events с новыми достижениями (achievement_awarded)
+    и изменениями прогресса (progress_changed) пользователя вместо опроса
+    users/achievements и users/progress. Работает только под ASGI
+    (config.asgi): между событиями соединение не занимает воркер. Под WSGI
+    бесконечный асинхронный поток сначала вычитывается целиком, поэтому
+    ответ никогда не начнётся, а воркер будет занят навсегда — такой запрос
+    отклоняется с 501.
+    """
+
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer]
+
+    def get(self, request):
+        # scope есть только у ASGIRequest
+        if not hasattr(request, "scope"):
+            raise StreamingUnavailable
+        response = StreamingHttpResponse(
+            stream_learning_events(request.user.pk),
+            content_type=EventStreamRenderer.media_type,
+        )
+        response["Cache-Control"] = "no-cache"
+        # Отключает буферизацию ответа в nginx
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class LeaderboardMixin(APIView):
+    """
+    Рейтинг из courses.leaderboards: metric из пути, ?course=<slug> —
+    рейтинг курса вместо общего.
+    """
+
+    max_limit = 100
+
+    def get_leaderboard_course_id(self, metric):
+        if metric not in LEADERBOARD_METRICS:
+            raise Http404
+        course_slug = self.request.query_params.get("course")
+        if course_slug is None:
+            return None
+        if metric not in COURSE_LEADERBOARD_METRICS:
+            raise ValidationError({"course": "Для этого рейтинга нет рейтинга курса"})
+        course_id = (
+            Course.objects.filter(slug=course_slug).values_list("pk", flat=True).first()
+        )
+        if course_id is None:
+            raise Http404
+        return course_id
+
+
+class LeaderboardTopView(LeaderboardMixin):
+    """
+    Первые ?limit= (по умолчанию 10) участников рейтинга.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, metric):
+        course_id = self.get_leaderboard_course_id(metric)
+        limit = get_int_param(request, "limit", 10, self.max_limit)
+        return Response(
+            {"results": get_top(metric, course_id=course_id, limit=limit)},
+            status=status.HTTP_200_OK,
+        )
+
+
+class LeaderboardAroundMeView(LeaderboardMixin):
+    """
+    Место пользователя в рейтинге и ?radius= (по умолчанию 5) соседей
+    выше и ниже. Пустой список, если пользователя ещё нет в рейтинге.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, metric):
+        course_id = self.get_leaderboard_course_id(metric)
+        radius = get_int_param(request, "radius", 5, self.max_limit // 2)
+        return Response(
+            {
+                "results": get_around(
+                    metric, request.user.pk, course_id=course_id, radius=radius
+                )
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,102 @@
+import json
+import logging
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+LEARNING_EVENTS_CHANNEL = "courses:learning-events:{user_id}"
+EVENT_ACHIEVEMENT_AWARDED = "achievement_awarded"
+EVENT_PROGRESS_CHANGED = "progress_changed"
+# Интервал (сек.) пустых сообщений, чтобы прокси не закрывали
+# простаивающее соединение
+EVENT_STREAM_KEEPALIVE = 15
+# Через сколько (мс) браузер переподключается после обрыва
+EVENT_STREAM_RETRY = 5000
+
+
+def get_redis_client():
+    """
+    Клиент Redis из пула соединений кэша (django-redis).
+    """
+    return get_redis_connection("default")
+
+
+def format_event(event, data):
+    """
+    Кадр text/event-stream.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def publish_learning_events(events):
+    """
+    Публикует события обучения [(user_id, event, data)] в каналы
+    пользователей Redis после коммита, одним конвейером. Недоступность
+    Redis не ломает запрос: событие теряется, клиент получит состояние
+    при следующем запросе.
+    """
+    events = list(events)
+    if not events:
+        return
+
+    def publish():
+        try:
+            with get_redis_client().pipeline(transaction=False) as pipe:
+                for user_id, event, data in events:
+                    pipe.publish(
+                        LEARNING_EVENTS_CHANNEL.format(user_id=user_id),
+                        format_event(event, data),
+                    )
+                pipe.execute()
+        except redis.RedisError:
+            logger.warning("Failed to publish learning events", exc_info=True)
+
+    transaction.on_commit(publish)
+
+
+def publish_achievements_awarded(awards):
+    publish_learning_events(
+        (award.user_id, EVENT_ACHIEVEMENT_AWARDED, {"id": award.achievement_id})
+        for award in awards
+    )
+
+
+def publish_progress_changed(user_course, progress):
+    publish_learning_events(
+        [
+            (
+                user_course.user_id,
+                EVENT_PROGRESS_CHANGED,
+                {"course_id": user_course.course_id, **progress.get_progress_details()},
+            )
+        ]
+    )
+
+
+async def stream_learning_events(user_id):
+    """
+    Асинхронный поток кадров text/event-stream для пользователя: каждое
+    соединение подписано только на свой канал Redis и между событиями
+    не занимает ни поток, ни соединение с БД.
+    """
+    client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(LEARNING_EVENTS_CHANNEL.format(user_id=user_id))
+        yield f"retry: {EVENT_STREAM_RETRY}\n\n"
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=EVENT_STREAM_KEEPALIVE
+            )
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield message["data"]
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,148 @@
+import csv
+import json
+from itertools import groupby, islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+
+from courses.models import UserCourse, UserCourseLesson, UserCourseSurvey
+from courses.models.structure import get_course_structure
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    "user_id",
+    "email",
+    "module_id",
+    "lesson_id",
+    "lesson_title",
+    "survey_id",
+    "status",
+]
+
+
+class StatusStream:
+    """
+    Статусы уроков или опросов, упорядоченные по user_course_id и
+    сгруппированные по пользовательскому курсу. Читаются по мере
+    продвижения по пользовательским курсам, поэтому в памяти
+    только статусы одного ученика.
+    """
+
+    def __init__(self, rows):
+        self.groups = groupby(rows, key=itemgetter(0))
+        self.current = next(self.groups, None)
+
+    def pop(self, user_course_id):
+        while self.current is not None and self.current[0] < user_course_id:
+            self.current = next(self.groups, None)
+        if self.current is None or self.current[0] != user_course_id:
+            return {}
+        statuses = {key: status for _, key, status in self.current[1]}
+        self.current = next(self.groups, None)
+        return statuses
+
+
+def iter_course_progress_rows(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки выгрузки прогресса по курсу: по одной на каждый урок и каждый
+    опрос урока для каждого записавшегося ученика, в порядке курса.
+
+    Пользовательские курсы, уроки и опросы читаются тремя серверными
+    курсорами, упорядоченными по user_course_id, и сливаются на лету.
+    """
+    structure = get_course_structure(course.pk)
+    lessons = [
+        (module["id"], lesson)
+        for module in structure.modules
+        for lesson in module["lessons"]
+    ]
+
+    lesson_statuses = StatusStream(
+        UserCourseLesson.objects.filter(user_course__course=course)
+        .order_by("user_course_id")
+        .values_list("user_course_id", "lesson_id", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+    survey_statuses = StatusStream(
+        UserCourseSurvey.objects.filter(user_course__course=course)
+        .order_by("user_course_id")
+        .values_list("user_course_id", "survey_id", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+    user_courses = (
+        UserCourse.objects.filter(course=course)
+        .order_by("pk")
+        .values_list("pk", "user_id", "user__email")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    for user_course_id, user_id, email in user_courses:
+        lessons_done = lesson_statuses.pop(user_course_id)
+        surveys_done = survey_statuses.pop(user_course_id)
+        for module_id, lesson in lessons:
+            row = {
+                "user_id": user_id,
+                "email": email,
+                "module_id": module_id,
+                "lesson_id": lesson["id"],
+                "lesson_title": lesson["title"],
+            }
+            yield {
+                **row,
+                "survey_id": None,
+                "status": lessons_done.get(
+                    lesson["id"], UserCourseLesson.STATUS_NOT_VIEWED
+                ),
+            }
+            for survey_id in lesson["survey_ids"]:
+                yield {
+                    **row,
+                    "survey_id": survey_id,
+                    "status": surveys_done.get(
+                        survey_id, UserCourseSurvey.STATUS_NOT_COMPLETED_YET
+                    ),
+                }
+
+
+class Echo:
+    """
+    Псевдофайл для csv.writer: write возвращает строку, а не пишет её.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def render_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_in_chunks(iterable, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Асинхронная обёртка над выгрузкой для ASGI: синхронный итератор
+    StreamingHttpResponse там целиком вычитывает в память. Строки берутся
+    кусками по chunk_size в рабочем потоке запроса (sync_to_async),
+    поэтому серверные курсоры остаются на его соединении с базой.
+    """
+    iterator = iter(iterable)
+
+    def next_chunk():
+        return "".join(islice(iterator, chunk_size))
+
+    while chunk := await sync_to_async(next_chunk)():
+        yield chunk
+
+
+EXPORT_RENDERERS = {
+    "ndjson": ("application/x-ndjson", render_ndjson),
+    "csv": ("text/csv", render_csv),
+}
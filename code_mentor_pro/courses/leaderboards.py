@@ -0,0 +1,201 @@
+import logging
+from itertools import batched, groupby
+from operator import itemgetter
+
+import redis
+from django.db import transaction
+from django.db.models import Count
+
+from code_mentor_pro.users.models import User
+from courses.events import get_redis_client
+from courses.models.achievements.checks import (METRIC_COMPLETED_LESSONS,
+                                                METRIC_COMPLETED_SURVEYS,
+                                                get_metric_source)
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = "courses:leaderboard:{metric}"
+COURSE_LEADERBOARD_KEY = "courses:leaderboard:{metric}:course:{course_id}"
+LEADERBOARD_KEY_PATTERN = "courses:leaderboard:*"
+LEADERBOARD_ACHIEVEMENTS = "achievements"
+# Рейтинги по всем курсам и по отдельному курсу (достижения не привязаны к курсу)
+LEADERBOARD_METRICS = [
+    LEADERBOARD_ACHIEVEMENTS,
+    METRIC_COMPLETED_LESSONS,
+    METRIC_COMPLETED_SURVEYS,
+]
+COURSE_LEADERBOARD_METRICS = [METRIC_COMPLETED_LESSONS, METRIC_COMPLETED_SURVEYS]
+LEADERBOARD_REBUILD_BATCH_SIZE = 1000
+
+
+def get_leaderboard_key(metric, course_id=None):
+    if course_id is None:
+        return LEADERBOARD_KEY.format(metric=metric)
+    return COURSE_LEADERBOARD_KEY.format(metric=metric, course_id=course_id)
+
+
+def increment_leaderboards(increments):
+    """
+    Сдвигает очки в рейтингах [(key, user_id, delta)] после коммита одним
+    конвейером. Ошибки Redis не ломают запрос: расхождение исправит
+    rebuild_leaderboards.
+    """
+    increments = [item for item in increments if item[2]]
+    if not increments:
+        return
+
+    def increment():
+        try:
+            with get_redis_client().pipeline(transaction=False) as pipe:
+                for key, user_id, delta in increments:
+                    pipe.zincrby(key, delta, user_id)
+                pipe.execute()
+        except redis.RedisError:
+            logger.warning("Failed to update leaderboards", exc_info=True)
+
+    transaction.on_commit(increment)
+
+
+def record_completion_change(user_id, course_id, metric, delta):
+    """
+    Завершение (+1) или откат завершения (-1) урока или опроса
+    в общем рейтинге и рейтинге курса.
+    """
+    record_completion_changes([(user_id, course_id, metric, delta)])
+
+
+def record_completion_changes(changes):
+    """
+    То же для многих изменений [(user_id, course_id, metric, delta)]
+    одним конвейером.
+    """
+    increment_leaderboards(
+        (key, user_id, delta)
+        for user_id, course_id, metric, delta in changes
+        for key in (
+            get_leaderboard_key(metric),
+            get_leaderboard_key(metric, course_id),
+        )
+    )
+
+
+def record_achievements_awarded(awards, *, delta=1):
+    """
+    Выдача (+1) или удаление (-1) достижений в рейтинге достижений.
+    """
+    increment_leaderboards(
+        (get_leaderboard_key(LEADERBOARD_ACHIEVEMENTS), award.user_id, delta)
+        for award in awards
+    )
+
+
+def get_leaderboard_rows(key, start, stop):
+    """
+    Строки рейтинга с позициями start..stop (с нуля, включительно):
+    [{"rank", "user": {"id", "name"}, "score"}]. Имена — одним запросом.
+    """
+    entries = get_redis_client().zrevrange(key, start, stop, withscores=True)
+    user_ids = [int(member) for member, _ in entries]
+    names = dict(User.objects.filter(pk__in=user_ids).values_list("pk", "name"))
+    return [
+        {
+            "rank": start + position + 1,
+            "user": {"id": user_id, "name": names.get(user_id, "")},
+            "score": int(score),
+        }
+        for position, (user_id, (_, score)) in enumerate(
+            zip(user_ids, entries, strict=True)
+        )
+    ]
+
+
+def get_top(metric, course_id=None, limit=10):
+    return get_leaderboard_rows(get_leaderboard_key(metric, course_id), 0, limit - 1)
+
+
+def get_around(metric, user_id, course_id=None, radius=5):
+    """
+    Позиция пользователя и radius соседей выше и ниже.
+    Пустой список, если пользователя нет в рейтинге.
+    """
+    key = get_leaderboard_key(metric, course_id)
+    rank = get_redis_client().zrevrank(key, user_id)
+    if rank is None:
+        return []
+    return get_leaderboard_rows(key, max(rank - radius, 0), rank + radius)
+
+
+def iter_leaderboard_scores():
+    """
+    Очки всех рейтингов по данным Postgres: (key, [(user_id, score)]).
+    Один сгруппированный запрос на рейтинг.
+    """
+    from courses.models import UserAchievement
+
+    achievements = (
+        UserAchievement.objects.order_by()
+        .values("user_id")
+        .annotate(total=Count("pk"))
+        .values_list("user_id", "total")
+        .iterator(chunk_size=LEADERBOARD_REBUILD_BATCH_SIZE)
+    )
+    yield get_leaderboard_key(LEADERBOARD_ACHIEVEMENTS), achievements
+
+    for metric in COURSE_LEADERBOARD_METRICS:
+        queryset, user_field = get_metric_source(metric)
+        yield (
+            get_leaderboard_key(metric),
+            queryset.order_by()
+            .values(user_field)
+            .annotate(total=Count("pk"))
+            .values_list(user_field, "total")
+            .iterator(chunk_size=LEADERBOARD_REBUILD_BATCH_SIZE),
+        )
+
+        course_scores = (
+            queryset.order_by("user_course__course_id")
+            .values("user_course__course_id", user_field)
+            .annotate(total=Count("pk"))
+            .values_list("user_course__course_id", user_field, "total")
+            .iterator(chunk_size=LEADERBOARD_REBUILD_BATCH_SIZE)
+        )
+        for course_id, rows in groupby(course_scores, key=itemgetter(0)):
+            yield (
+                get_leaderboard_key(metric, course_id),
+                ((user_id, total) for _, user_id, total in rows),
+            )
+
+
+def rebuild_leaderboards():
+    """
+    Пересобирает все рейтинги из Postgres. Каждый рейтинг заполняется во
+    временном ключе и подменяет старый через RENAME, поэтому чтения не
+    видят его наполовину собранным. Рейтинги курсов без очков удаляются.
+    ZINCRBY, выполненные между чтением рейтинга из Postgres и RENAME,
+    теряются вместе со старым ключом: пересобирать лучше при низкой
+    нагрузке, пропущенные изменения исправит следующая пересборка.
+
+    Возвращает {key: количество пользователей}.
+    """
+    client = get_redis_client()
+    stale_keys = {
+        key.decode() if isinstance(key, bytes) else key
+        for key in client.scan_iter(match=LEADERBOARD_KEY_PATTERN)
+    }
+    rebuilt = {}
+    for key, scores in iter_leaderboard_scores():
+        tmp_key = f"{key}:rebuild"
+        client.delete(tmp_key)
+        count = 0
+        for batch in batched(scores, LEADERBOARD_REBUILD_BATCH_SIZE):
+            client.zadd(tmp_key, dict(batch))
+            count += len(batch)
+        if count:
+            client.rename(tmp_key, key)
+        else:
+            client.delete(key)
+        stale_keys.discard(key)
+        rebuilt[key] = count
+    if stale_keys:
+        client.delete(*stale_keys)
+    return rebuilt
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.tasks import get_achievement_check_stats
+
+
+class Command(BaseCommand):
+    help = "Показывает, сколько проверок достижений поставлено и сколько объединено."
+
+    def handle(self, *args, **options):
+        stats = get_achievement_check_stats()
+        total = stats["dispatched"] + stats["suppressed"]
+        saved = round(stats["suppressed"] / total * 100) if total else 0
+        self.stdout.write(
+            f"Поставлено задач: {stats['dispatched']}, "
+            f"подавлено: {stats['suppressed']} ({saved}% запросов)"
+        )
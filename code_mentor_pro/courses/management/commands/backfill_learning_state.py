@@ -0,0 +1,181 @@
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from courses.models import UserCourse, UserCourseProgress, award_achievements
+
+
+def process_chunk(user_course_ids, *, dry_run=False):
+    """
+    Пересчитывает прогресс и выдаёт достижения для пачки пользовательских
+    курсов. Вызывается в воркере пула, поэтому функция модульного уровня.
+    Записываются только отличающиеся от сохранённых счётчики прогресса.
+
+    Возвращает (id последней записи, изменено записей прогресса,
+    новых достижений).
+    """
+    user_courses = UserCourse.objects.filter(pk__in=user_course_ids).only(
+        "pk", "user_id", "course_id"
+    )
+    stored = {
+        progress.user_course_id: progress
+        for progress in UserCourseProgress.objects.filter(
+            user_course_id__in=user_course_ids
+        )
+    }
+    changed = [
+        progress
+        for progress in UserCourseProgress.objects.build(user_courses)
+        if is_progress_changed(stored.get(progress.user_course_id), progress)
+    ]
+    if not dry_run:
+        UserCourseProgress.objects.upsert(changed)
+
+    user_ids = {user_course.user_id for user_course in user_courses}
+    awarded = len(award_achievements(user_ids, dry_run=dry_run))
+    return user_course_ids[-1], len(changed), awarded
+
+
+def is_progress_changed(stored, progress):
+    if stored is None:
+        return True
+    return any(
+        bytes(getattr(stored, field)) != bytes(getattr(progress, field))
+        if isinstance(getattr(progress, field), bytes)
+        else getattr(stored, field) != getattr(progress, field)
+        for field in UserCourseProgress.PROGRESS_FIELDS
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает производное состояние обучения (счётчики прогресса "
+        "и выданные достижения) для всех записей на курсы пачками, "
+        "при необходимости в несколько процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Количество процессов; 1 — выполнять в текущем процессе.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="JSON-файл с id последней обработанной записи для продолжения.",
+        )
+        parser.add_argument(
+            "--start-after",
+            type=int,
+            help="Начать после указанного id UserCourse (вместо чекпоинта).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать изменения, ничего не записывая.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["workers"] < 1:
+            msg = "--chunk-size и --workers должны быть положительными"
+            raise CommandError(msg)
+
+        self.checkpoint = options["checkpoint"] and Path(options["checkpoint"])
+        self.dry_run = options["dry_run"]
+        last_id = options["start_after"]
+        if last_id is None:
+            last_id = self.read_checkpoint()
+
+        self.started = time.monotonic()
+        self.processed = self.changed = self.awarded = 0
+        chunks = self.iter_chunks(last_id, options["chunk_size"])
+
+        if options["workers"] == 1:
+            for chunk in chunks:
+                self.chunk_done(chunk, *process_chunk(chunk, dry_run=self.dry_run))
+        else:
+            self.run_pool(chunks, options["workers"])
+
+        elapsed = time.monotonic() - self.started
+        action = "Устаревших записей" if self.dry_run else "Обновлено записей"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано записей: {self.processed} за {elapsed:.1f} с "
+                f"({self.rate(elapsed):.0f}/с). {action} прогресса: "
+                f"{self.changed}, новых достижений: {self.awarded}"
+            )
+        )
+
+    def iter_chunks(self, last_id, chunk_size):
+        while True:
+            chunk = list(
+                UserCourse.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1]
+
+    def run_pool(self, chunks, workers):
+        """
+        Раздаёт пачки пулу процессов, держа в работе не больше 2 * workers.
+        Чекпоинт сдвигается только по непрерывно завершённым пачкам,
+        чтобы после прерывания ничего не пропустить.
+        """
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            # С fork все процессы создаются при первой задаче: делаем это,
+            # пока у родителя нет открытых соединений с БД
+            executor.submit(int).result()
+            pending = []
+            for chunk in chunks:
+                pending.append(
+                    (
+                        chunk,
+                        executor.submit(process_chunk, chunk, dry_run=self.dry_run),
+                    )
+                )
+                while len(pending) >= workers * 2 or (
+                    pending and pending[0][1].done()
+                ):
+                    done_chunk, future = pending.pop(0)
+                    self.chunk_done(done_chunk, *future.result())
+            for done_chunk, future in pending:
+                self.chunk_done(done_chunk, *future.result())
+
+    def chunk_done(self, chunk, last_id, changed, awarded):
+        self.processed += len(chunk)
+        self.changed += changed
+        self.awarded += awarded
+        if not self.dry_run:
+            self.write_checkpoint(last_id)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"До id {last_id}: {self.processed} записей, "
+            f"{self.rate(elapsed):.0f}/с"
+        )
+
+    def rate(self, elapsed):
+        return self.processed / elapsed if elapsed else 0
+
+    def read_checkpoint(self):
+        if not self.checkpoint or not self.checkpoint.exists():
+            return 0
+        last_id = json.loads(self.checkpoint.read_text())["last_id"]
+        self.stdout.write(f"Продолжение с чекпоинта после id {last_id}")
+        return last_id
+
+    def write_checkpoint(self, last_id):
+        if self.checkpoint:
+            self.checkpoint.write_text(json.dumps({"last_id": last_id}))
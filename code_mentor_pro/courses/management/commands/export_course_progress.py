@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.export import (EXPORT_CHUNK_SIZE, EXPORT_RENDERERS,
+                            iter_course_progress_rows)
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Потоково выгружает статусы уроков и опросов всех учеников курса."
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_slug")
+        parser.add_argument(
+            "--output-format", choices=list(EXPORT_RENDERERS), default="ndjson"
+        )
+        parser.add_argument("--output", help="Файл для записи, по умолчанию stdout.")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(slug=options["course_slug"])
+        except Course.DoesNotExist as exc:
+            msg = f"Курс {options['course_slug']} не найден"
+            raise CommandError(msg) from exc
+
+        _, render = EXPORT_RENDERERS[options["output_format"]]
+        chunks = render(
+            iter_course_progress_rows(course, chunk_size=options["chunk_size"])
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import UserCourse, UserCourseProgress
+
+
+class Command(BaseCommand):
+    help = "Пересобирает или проверяет счётчики прогресса (UserCourseProgress)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Только сравнить сохранённые счётчики с посчитанными, без записи.",
+        )
+        parser.add_argument("--course", type=int, help="id курса")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_courses = UserCourse.objects.order_by("pk")
+        if options["course"]:
+            user_courses = user_courses.filter(course_id=options["course"])
+
+        processed = 0
+        mismatched = 0
+        last_id = 0
+        while True:
+            batch_ids = list(
+                user_courses.filter(pk__gt=last_id).values_list("pk", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch_ids:
+                break
+            batch = UserCourse.objects.filter(pk__in=batch_ids).only("pk", "course_id")
+
+            if options["verify"]:
+                mismatched += self.verify(batch)
+            else:
+                UserCourseProgress.objects.refresh(batch)
+
+            processed += len(batch_ids)
+            last_id = batch_ids[-1]
+
+        if options["verify"]:
+            if mismatched:
+                msg = f"Расхождения в {mismatched} из {processed} записей"
+                raise CommandError(msg)
+            self.stdout.write(self.style.SUCCESS(f"Проверено записей: {processed}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Пересобрано записей: {processed}"))
+
+    def verify(self, user_courses):
+        """
+        Сравнивает сохранённые счётчики с посчитанными агрегирующим
+        запросом по таблицам курса (без кэша структуры).
+        """
+        stored = {
+            progress.user_course_id: progress
+            for progress in UserCourseProgress.objects.filter(
+                user_course__in=user_courses
+            )
+        }
+        mismatched = 0
+        for user_course in user_courses.with_progress():
+            expected = user_course.compute_progress_details()
+            actual = stored.get(user_course.pk)
+            actual = actual and actual.get_progress_details()
+            if actual != expected:
+                mismatched += 1
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"UserCourse {user_course.pk}: "
+                        f"сохранено {actual}, ожидается {expected}"
+                    )
+                )
+        return mismatched
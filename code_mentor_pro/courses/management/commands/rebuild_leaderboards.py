@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from courses.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Пересобирает рейтинги в Redis по данным Postgres."
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_leaderboards()
+        for key, count in rebuilt.items():
+            self.stdout.write(f"{key}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Пересобрано рейтингов: {len(rebuilt)}"))
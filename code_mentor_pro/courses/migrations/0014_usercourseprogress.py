@@ -0,0 +1,70 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0013_achievement_userachievement"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="achievement",
+            name="code",
+            field=models.CharField(
+                choices=[
+                    ("ENROLL_FIRST_COURSE", "Зачислиться на 1 курс"),
+                    ("COMPLETE_FIRST_SURVEY", "Пройти 1 опрос"),
+                    ("COMPLETE_FIVE_SURVEYS", "Пройти 5 опросов"),
+                    ("COMPLETE_TEN_SURVEYS", "Пройти 10 опросов"),
+                    ("COMPLETE_FIRST_LESSON", "Пройти 1 урок"),
+                    ("COMPLETE_FIVE_LESSONS", "Пройти 5 уроков"),
+                    ("COMPLETE_TEN_LESSONS", "Пройти 10 уроков"),
+                ],
+                max_length=64,
+                unique=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="UserCourseProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                ("total_lessons", models.PositiveIntegerField(default=0)),
+                ("completed_lessons", models.PositiveIntegerField(default=0)),
+                ("total_surveys", models.PositiveIntegerField(default=0)),
+                ("completed_surveys", models.PositiveIntegerField(default=0)),
+                (
+                    "user_course",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress",
+                        to="courses.usercourse",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
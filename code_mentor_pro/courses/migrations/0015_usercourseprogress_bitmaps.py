@@ -0,0 +1,28 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0014_usercourseprogress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usercourseprogress",
+            name="bitmap_layout",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="usercourseprogress",
+            name="completed_lessons_bitmap",
+            field=models.BinaryField(default=b""),
+        ),
+        migrations.AddField(
+            model_name="usercourseprogress",
+            name="completed_surveys_bitmap",
+            field=models.BinaryField(default=b""),
+        ),
+    ]
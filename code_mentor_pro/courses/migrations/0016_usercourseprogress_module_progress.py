@@ -0,0 +1,18 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0015_usercourseprogress_bitmaps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usercourseprogress",
+            name="module_progress",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
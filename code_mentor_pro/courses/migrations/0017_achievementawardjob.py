@@ -0,0 +1,66 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0016_usercourseprogress_module_progress"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AchievementAwardJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("STATUS_PENDING", "В очереди"),
+                            ("STATUS_RUNNING", "Выполняется"),
+                            ("STATUS_COMPLETED", "Завершена"),
+                            ("STATUS_FAILED", "Ошибка"),
+                        ],
+                        default="STATUS_PENDING",
+                        max_length=20,
+                    ),
+                ),
+                ("awarded_count", models.PositiveIntegerField(default=0)),
+                ("last_user_id", models.PositiveIntegerField(default=0)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True)),
+                (
+                    "achievement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="award_jobs",
+                        to="courses.achievement",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
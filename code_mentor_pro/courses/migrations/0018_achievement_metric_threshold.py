@@ -0,0 +1,76 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:26
+
+from django.core.cache import cache
+from django.db import migrations, models
+
+ACHIEVEMENT_RULES = {
+    "ENROLL_FIRST_COURSE": ("enrollments", 1),
+    "COMPLETE_FIRST_SURVEY": ("completed_surveys", 1),
+    "COMPLETE_FIVE_SURVEYS": ("completed_surveys", 5),
+    "COMPLETE_TEN_SURVEYS": ("completed_surveys", 10),
+    "COMPLETE_FIRST_LESSON": ("completed_lessons", 1),
+    "COMPLETE_FIVE_LESSONS": ("completed_lessons", 5),
+    "COMPLETE_TEN_LESSONS": ("completed_lessons", 10),
+}
+
+
+def set_achievement_rules(apps, schema_editor):
+    Achievement = apps.get_model("courses", "Achievement")
+
+    for code, (metric, threshold) in ACHIEVEMENT_RULES.items():
+        Achievement.objects.filter(code=code).update(metric=metric, threshold=threshold)
+
+
+def forget_achievement_rules(apps, schema_editor):
+    # courses.models.achievements.ACHIEVEMENT_RULES_KEY: update() и
+    # исторические модели не отправляют сигналов, сбрасывающих кэш условий
+    cache.delete("courses:achievement-rules")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0017_achievementawardjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="achievement",
+            name="metric",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("enrollments", "Записей на курсы"),
+                    ("completed_surveys", "Пройденных опросов"),
+                    ("completed_lessons", "Пройденных уроков"),
+                ],
+                max_length=32,
+            ),
+        ),
+        migrations.AddField(
+            model_name="achievement",
+            name="threshold",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name="achievement",
+            name="code",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("ENROLL_FIRST_COURSE", "Зачислиться на 1 курс"),
+                    ("COMPLETE_FIRST_SURVEY", "Пройти 1 опрос"),
+                    ("COMPLETE_FIVE_SURVEYS", "Пройти 5 опросов"),
+                    ("COMPLETE_TEN_SURVEYS", "Пройти 10 опросов"),
+                    ("COMPLETE_FIRST_LESSON", "Пройти 1 урок"),
+                    ("COMPLETE_FIVE_LESSONS", "Пройти 5 уроков"),
+                    ("COMPLETE_TEN_LESSONS", "Пройти 10 уроков"),
+                ],
+                max_length=64,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.RunPython(set_achievement_rules, migrations.RunPython.noop),
+        migrations.RunPython(forget_achievement_rules, forget_achievement_rules),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0018_achievement_metric_threshold"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userachievement",
+            index=models.Index(
+                condition=models.Q(("is_notified", False)),
+                fields=["id"],
+                name="userachievement_unnotified_idx",
+            ),
+        ),
+    ]
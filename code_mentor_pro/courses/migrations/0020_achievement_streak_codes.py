@@ -0,0 +1,94 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:35
+
+from django.core.cache import cache
+from django.db import migrations, models
+
+STREAK_ACHIEVEMENTS = [
+    {
+        "code": "STREAK_SEVEN_DAYS",
+        "title": "Заниматься 7 дней подряд",
+        "description": "Завершайте материал, урок или опрос семь дней подряд.",
+        "threshold": 7,
+    },
+    {
+        "code": "STREAK_THIRTY_DAYS",
+        "title": "Заниматься 30 дней подряд",
+        "description": "Завершайте материал, урок или опрос тридцать дней подряд.",
+        "threshold": 30,
+    },
+]
+
+
+def create_streak_achievements(apps, schema_editor):
+    Achievement = apps.get_model("courses", "Achievement")
+
+    for data in STREAK_ACHIEVEMENTS:
+        Achievement.objects.update_or_create(
+            code=data["code"],
+            defaults={
+                "title": data["title"],
+                "description": data["description"],
+                "metric": "longest_streak",
+                "threshold": data["threshold"],
+            },
+        )
+
+
+def delete_streak_achievements(apps, schema_editor):
+    Achievement = apps.get_model("courses", "Achievement")
+    Achievement.objects.filter(
+        code__in=[data["code"] for data in STREAK_ACHIEVEMENTS]
+    ).delete()
+
+
+def forget_achievement_rules(apps, schema_editor):
+    # courses.models.achievements.ACHIEVEMENT_RULES_KEY: update() и
+    # исторические модели не отправляют сигналов, сбрасывающих кэш условий
+    cache.delete("courses:achievement-rules")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0019_userachievement_notification_outbox"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="achievement",
+            name="code",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("ENROLL_FIRST_COURSE", "Зачислиться на 1 курс"),
+                    ("COMPLETE_FIRST_SURVEY", "Пройти 1 опрос"),
+                    ("COMPLETE_FIVE_SURVEYS", "Пройти 5 опросов"),
+                    ("COMPLETE_TEN_SURVEYS", "Пройти 10 опросов"),
+                    ("COMPLETE_FIRST_LESSON", "Пройти 1 урок"),
+                    ("COMPLETE_FIVE_LESSONS", "Пройти 5 уроков"),
+                    ("COMPLETE_TEN_LESSONS", "Пройти 10 уроков"),
+                    ("STREAK_SEVEN_DAYS", "Заниматься 7 дней подряд"),
+                    ("STREAK_THIRTY_DAYS", "Заниматься 30 дней подряд"),
+                ],
+                max_length=64,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="achievement",
+            name="metric",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("enrollments", "Записей на курсы"),
+                    ("completed_surveys", "Пройденных опросов"),
+                    ("completed_lessons", "Пройденных уроков"),
+                    ("longest_streak", "Дней активности подряд"),
+                ],
+                max_length=32,
+            ),
+        ),
+        migrations.RunPython(create_streak_achievements, delete_streak_achievements),
+        migrations.RunPython(forget_achievement_rules, forget_achievement_rules),
+    ]
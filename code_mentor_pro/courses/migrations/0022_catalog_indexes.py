@@ -0,0 +1,29 @@
+# Generated by Django 5.1.9 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0021_search_vectors"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["id"],
+                name="course_published_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["level", "programming_language", "certificate_available", "id"],
+                name="course_catalog_facets_idx",
+            ),
+        ),
+    ]
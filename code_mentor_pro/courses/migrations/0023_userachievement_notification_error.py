@@ -0,0 +1,18 @@
+# Generated by Django 5.1.9 on 2026-10-18 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0022_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userachievement",
+            name="notification_error",
+            field=models.TextField(blank=True),
+        ),
+    ]
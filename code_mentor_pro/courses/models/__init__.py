@@ -1,10 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.text import slugify
 
 from code_mentor_pro.users.models import User
-from common.models import SimpleBaseModel
+from common.models import SimpleBaseModel, StatusTrackingMixin
 
 from .achievements import *
+from .managers import (CourseQuerySet, UserCourseProgressManager,
+                       UserCourseQuerySet)
+from .progress import (bitmap_positions, build_progress_details,
+                       get_user_course_progress)
+from .search import search_vector_field
 
 
 class Course(SimpleBaseModel):
@@ -38,6 +44,27 @@ class Course(SimpleBaseModel):
     main_color = models.CharField(
         max_length=20, blank=True, null=True, help_text="HEX color code"
     )
+    search_vector = search_vector_field(
+        ("title", "A"), ("short_description", "B"), ("description", "C")
+    )
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="course_search_idx"),
+            # Каталог: опубликованные курсы по фильтрам и курсору (pk)
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_published=True),
+                name="course_published_idx",
+            ),
+            models.Index(
+                fields=["level", "programming_language", "certificate_available", "id"],
+                condition=models.Q(is_published=True),
+                name="course_catalog_facets_idx",
+            ),
+        ]
 
     def enroll_user(self, user: User) -> "UserCourse":
         if user.user_courses.filter(course=self).exists():
@@ -64,6 +91,15 @@ class UserCourse(SimpleBaseModel):
         Course, on_delete=models.CASCADE, related_name="user_courses"
     )
 
+    objects = UserCourseQuerySet.as_manager()
+
+    # Есть только у записей из UserCourse.objects.with_progress()
+    progress_total_lessons: int
+    progress_completed_lessons: int
+    progress_total_surveys: int
+    progress_completed_surveys: int
+    progress_modules: list[dict]
+
     def get_progress_details(self):
         """
         Возвращает прогресс пользователя по курсу:
@@ -72,57 +108,33 @@ class UserCourse(SimpleBaseModel):
         - total_surveys: всего опросов
         - completed_surveys: завершённые пользователем
         - progress_percent: общий прогресс по урокам и опросам
+        - modules: те же счётчики и процент по каждому модулю (module_id)
+
+        Берёт сохранённые счётчики UserCourseProgress, а если их ещё нет —
+        считает прогресс по структуре курса.
         """
-        lessons = Lesson.objects.filter(module__course=self.course).prefetch_related(
-            "surveys"
-        )
-        total_lessons = lessons.count()
-        completed_lessons = 0
-        total_surveys = 0
-        completed_surveys = 0
-
-        for lesson in lessons:
-            surveys = list(lesson.surveys.all())
-            survey_ids = [s.id for s in surveys]
-
-            # Подсчёт опросов
-            total_surveys += len(survey_ids)
-
-            completed_count = UserCourseSurvey.objects.filter(
-                user_course=self,
-                survey_id__in=survey_ids,
-                status=UserCourseSurvey.STATUS_COMPLETED,
-            ).count()
-            completed_surveys += completed_count
-
-            # Урок считается завершенным если:
-            # - нет опросов и статус lesson == COMPLETED
-            # - или все опросы завершены
-            if not survey_ids:
-                lesson_status = UserCourseLesson.objects.filter(
-                    user_course=self,
-                    lesson=lesson,
-                    status=UserCourseLesson.STATUS_COMPLETED,
-                ).exists()
-                if lesson_status:
-                    completed_lessons += 1
-            elif completed_count == len(survey_ids):
-                completed_lessons += 1
-
-        total_steps = total_lessons + total_surveys
-        completed_steps = completed_lessons + completed_surveys
-
-        progress_percent = (
-            round(completed_steps / total_steps * 100) if total_steps else 0
-        )
+        if not hasattr(self, "progress_total_lessons"):
+            progress = getattr(self, "progress", None)
+            if progress is not None:
+                return progress.get_progress_details()
+        return self.compute_progress_details()
 
-        return {
-            "total_lessons": total_lessons,
-            "completed_lessons": completed_lessons,
-            "total_surveys": total_surveys,
-            "completed_surveys": completed_surveys,
-            "progress_percent": progress_percent,
-        }
+    def compute_progress_details(self):
+        """
+        Считает прогресс по структуре курса, не используя сохранённые счётчики.
+
+        Если курс получен через UserCourse.objects.with_progress(),
+        используются уже посчитанные значения без дополнительных запросов.
+        """
+        if hasattr(self, "progress_total_lessons"):
+            return build_progress_details(
+                total_lessons=self.progress_total_lessons,
+                completed_lessons=self.progress_completed_lessons,
+                total_surveys=self.progress_total_surveys,
+                completed_surveys=self.progress_completed_surveys,
+                modules=self.progress_modules,
+            )
+        return get_user_course_progress(self)
 
     def get_progress_percent(self):
         """
@@ -132,6 +144,72 @@ class UserCourse(SimpleBaseModel):
         return details["progress_percent"]
 
 
+class UserCourseProgress(SimpleBaseModel):
+    """
+    Денормализованные счётчики прогресса по курсу.
+
+    Обновляются сигналами при смене статусов уроков и опросов пользователя
+    и при изменении структуры курса.
+    Пересобрать или проверить: python manage.py rebuild_course_progress
+    """
+
+    COUNTER_FIELDS = [
+        "total_lessons",
+        "completed_lessons",
+        "total_surveys",
+        "completed_surveys",
+    ]
+    PROGRESS_FIELDS = [
+        *COUNTER_FIELDS,
+        "module_progress",
+        "completed_lessons_bitmap",
+        "completed_surveys_bitmap",
+        "bitmap_layout",
+    ]
+
+    user_course = models.OneToOneField(
+        UserCourse, on_delete=models.CASCADE, related_name="progress"
+    )
+    total_lessons = models.PositiveIntegerField(default=0)
+    completed_lessons = models.PositiveIntegerField(default=0)
+    total_surveys = models.PositiveIntegerField(default=0)
+    completed_surveys = models.PositiveIntegerField(default=0)
+    # Те же счётчики по модулям в порядке курса: [{"module_id": ..., ...}]
+    module_progress = models.JSONField(default=list, blank=True)
+    # Бит N — урок (или пара урок-опрос) на позиции N в раскладке bitmap_layout
+    completed_lessons_bitmap = models.BinaryField(default=b"")
+    completed_surveys_bitmap = models.BinaryField(default=b"")
+    bitmap_layout = models.CharField(max_length=32, blank=True)
+
+    objects = UserCourseProgressManager()
+
+    def get_progress_details(self):
+        return build_progress_details(
+            total_lessons=self.total_lessons,
+            completed_lessons=self.completed_lessons,
+            total_surveys=self.total_surveys,
+            completed_surveys=self.completed_surveys,
+            modules=self.module_progress,
+        )
+
+    def get_completed_lesson_ids(self, structure):
+        """
+        id завершённых уроков по битовой карте. None, если карта посчитана
+        для другой раскладки курса и её нужно пересобрать.
+        """
+        if self.bitmap_layout != structure.layout:
+            return None
+        lesson_ids = list(structure.lesson_positions)
+        return {
+            lesson_ids[position]
+            for position in bitmap_positions(bytes(self.completed_lessons_bitmap))
+        }
+
+    def __str__(self):
+        progress_percent = self.get_progress_details()["progress_percent"]
+        return f"{self.user_course} — {progress_percent}%"
+
+
 class Module(SimpleBaseModel):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="modules")
     title = models.CharField(max_length=255)
@@ -151,15 +229,17 @@ class Lesson(SimpleBaseModel):
     description = models.TextField(blank=True)
     surveys = models.ManyToManyField("Survey", blank=True, related_name="lessons")
     order = models.PositiveIntegerField(default=0)
+    search_vector = search_vector_field(("title", "A"), ("description", "B"))
 
     class Meta:
         ordering = ["order"]
+        indexes = [GinIndex(fields=["search_vector"], name="lesson_search_idx")]
 
     def __str__(self):
         return f"{self.module} - {self.order}. {self.title}"
 
 
-class UserCourseLesson(SimpleBaseModel):
+class UserCourseLesson(StatusTrackingMixin, SimpleBaseModel):
     class Meta:
         unique_together = ("user_course", "lesson")
 
@@ -213,12 +293,16 @@ class Material(SimpleBaseModel):
     language = models.CharField(max_length=20, choices=LANGUAGE_CHOICES)
     link = models.URLField(blank=True, null=True)
     material_type = models.CharField(max_length=20, choices=MATERIAL_TYPE_CHOICES)
+    search_vector = search_vector_field(("title", "A"), ("description", "B"))
+
+    class Meta:
+        indexes = [GinIndex(fields=["search_vector"], name="material_search_idx")]
 
     def __str__(self):
         return f"{self.title}"
 
 
-class UserCourseLessonMaterial(SimpleBaseModel):
+class UserCourseLessonMaterial(StatusTrackingMixin, SimpleBaseModel):
     class Meta:
         unique_together = ("user_course_lesson", "material")
 
@@ -269,7 +353,7 @@ class AnswerOption(SimpleBaseModel):
     is_correct = models.BooleanField(default=False)
 
 
-class UserCourseSurvey(SimpleBaseModel):
+class UserCourseSurvey(StatusTrackingMixin, SimpleBaseModel):
     STATUS_NOT_COMPLETED_YET = "STATUS_NOT_COMPLETED_YET"
     STATUS_COMPLETED_WITH_FAILS = "STATUS_COMPLETED_WITH_FAILS"
     STATUS_COMPLETED = "STATUS_COMPLETED"
@@ -296,7 +380,7 @@ class UserCourseSurvey(SimpleBaseModel):
         unique_together = ("user_course", "survey")
 
 
-class UserAnswer(SimpleBaseModel):
+class UserAnswer(StatusTrackingMixin, SimpleBaseModel):
     STATUS_NOT_COMPLETED_YET = "STATUS_NOT_COMPLETED_YET"
     STATUS_COMPLETED_WITH_FAILS = "STATUS_COMPLETED_WITH_FAILS"
     STATUS_COMPLETED = "STATUS_COMPLETED"
@@ -1,16 +1,58 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from code_mentor_pro.users.models import User
-from common.models import SimpleBaseModel
+from common.models import SimpleBaseModel, StatusTrackingMixin
+from courses.events import publish_achievements_awarded
+from courses.leaderboards import record_achievements_awarded
 
-from .checks import (has_completed_first_lesson, has_completed_first_survey,
-                     has_completed_five_lessons, has_completed_five_surveys,
-                     has_completed_ten_lessons, has_completed_ten_surveys,
-                     has_enrolled_in_first_course)
+from ..versions import bump_learning_state_version
+from .checks import (EVENT_ENROLL, EVENT_LESSON_COMPLETED,
+                     EVENT_MATERIAL_COMPLETED, EVENT_SURVEY_COMPLETED,
+                     METRIC_CHOICES, METRIC_COMPLETED_LESSONS,
+                     METRIC_COMPLETED_SURVEYS, METRIC_ENROLLMENTS,
+                     METRIC_EVENTS, METRIC_LONGEST_STREAK, SQL_METRICS,
+                     get_qualifying_user_ids, get_users_metrics)
 
+# Экспортируется в courses.models (from .achievements import *), в том числе
+# события и метрики проверок
+__all__ = [
+    "EVENT_ENROLL",
+    "EVENT_LESSON_COMPLETED",
+    "EVENT_MATERIAL_COMPLETED",
+    "EVENT_SURVEY_COMPLETED",
+    "METRIC_COMPLETED_LESSONS",
+    "METRIC_COMPLETED_SURVEYS",
+    "METRIC_ENROLLMENTS",
+    "METRIC_EVENTS",
+    "METRIC_LONGEST_STREAK",
+    "SQL_METRICS",
+    "Achievement",
+    "AchievementAwardJob",
+    "UserAchievement",
+    "award_achievements",
+    "forget_achievement_rules",
+    "forget_awarded_achievement_ids",
+    "get_achievement_rules",
+    "get_awarded_achievement_ids",
+    "handle_achievements_awarded",
+    "insert_user_achievements",
+]
+
+AWARDED_ACHIEVEMENTS_KEY = "courses:awarded-achievements:{user_id}"
+AWARDED_ACHIEVEMENTS_TIMEOUT = 60 * 60 * 24
+ACHIEVEMENT_RULES_KEY = "courses:achievement-rules"
+# Миграции меняют достижения без сигналов; они сбрасывают ключ сами,
+# а срок жизни ограничивает устаревание при любых других обходах
+ACHIEVEMENT_RULES_TIMEOUT = 60 * 60
+
+
+class Achievement(StatusTrackingMixin, SimpleBaseModel):
+    # Включение достижения запускает выдачу задним числом (AchievementAwardJob)
+    status_field = "is_active"
 
-class Achievement(SimpleBaseModel):
     class AchievementCode(models.TextChoices):
         ENROLL_FIRST_COURSE = "ENROLL_FIRST_COURSE", _("Зачислиться на 1 курс")
 
@@ -22,21 +64,24 @@ class Achievement(SimpleBaseModel):
         COMPLETE_FIVE_LESSONS = "COMPLETE_FIVE_LESSONS", _("Пройти 5 уроков")
         COMPLETE_TEN_LESSONS = "COMPLETE_TEN_LESSONS", _("Пройти 10 уроков")
 
-    ACHIEVEMENT_CHECKS = {
-        AchievementCode.ENROLL_FIRST_COURSE: has_enrolled_in_first_course,
-        AchievementCode.COMPLETE_FIRST_SURVEY: has_completed_first_survey,
-        AchievementCode.COMPLETE_FIVE_SURVEYS: has_completed_five_surveys,
-        AchievementCode.COMPLETE_TEN_SURVEYS: has_completed_ten_surveys,
-        AchievementCode.COMPLETE_FIRST_LESSON: has_completed_first_lesson,
-        AchievementCode.COMPLETE_FIVE_LESSONS: has_completed_five_lessons,
-        AchievementCode.COMPLETE_TEN_LESSONS: has_completed_ten_lessons,
-    }
-
-    code = models.CharField(max_length=64, choices=AchievementCode.choices, unique=True)
+        STREAK_SEVEN_DAYS = "STREAK_SEVEN_DAYS", _("Заниматься 7 дней подряд")
+        STREAK_THIRTY_DAYS = "STREAK_THIRTY_DAYS", _("Заниматься 30 дней подряд")
+
+    code = models.CharField(
+        max_length=64,
+        choices=AchievementCode.choices,
+        unique=True,
+        blank=True,
+        null=True,
+    )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     icon = models.ImageField(upload_to="achievements/icons/", blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Условие: значение метрики пользователя не меньше порога.
+    # Без метрики достижение выдаётся только вручную
+    metric = models.CharField(max_length=32, choices=METRIC_CHOICES, blank=True)
+    threshold = models.PositiveIntegerField(default=1)
 
     def check_for_user(self, user) -> bool:
         """
@@ -48,13 +93,28 @@ class Achievement(SimpleBaseModel):
         if UserAchievement.objects.filter(user=user, achievement=self).exists():
             return True
 
-        check_fn = self.ACHIEVEMENT_CHECKS.get(self.code)
-        if check_fn and check_fn(user):
-            UserAchievement.objects.create(user=user, achievement=self)
-            return True
+        if self.metric:
+            metrics = get_users_metrics([user.pk], [self.metric]).get(user.pk)
+            if metrics and metrics[self.metric] >= self.threshold:
+                UserAchievement.objects.create(user=user, achievement=self)
+                return True
 
         return False
 
+    def get_qualifying_user_ids(self, after=0):
+        """
+        id пользователей, выполнивших условие и ещё не получивших достижение.
+        Только для метрик из SQL_METRICS.
+        """
+        return get_qualifying_user_ids(
+            self.metric,
+            self.threshold,
+            exclude_user_ids=UserAchievement.objects.filter(
+                achievement=self
+            ).values("user_id"),
+            after=after,
+        )
+
     def __str__(self):
         return self.title
 
@@ -66,9 +126,192 @@ class UserAchievement(SimpleBaseModel):
     achievement = models.ForeignKey(Achievement, on_delete=models.CASCADE)
     awarded_at = models.DateTimeField(auto_now_add=True)
     is_notified = models.BooleanField(default=False)
+    # Ошибка доставки по внешним каналам (courses.notifications): повторно
+    # такие уведомления не отправляются
+    notification_error = models.TextField(blank=True)
 
     class Meta:
         unique_together = ("user", "achievement")
+        indexes = [
+            # Очередь неотправленных уведомлений (courses.notifications)
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_notified=False),
+                name="userachievement_unnotified_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} — {self.achievement}"
+
+
+class AchievementAwardJob(SimpleBaseModel):
+    """
+    Выдача достижения задним числом всем, кто уже выполнил условие.
+    """
+
+    STATUS_PENDING = "STATUS_PENDING"
+    STATUS_RUNNING = "STATUS_RUNNING"
+    STATUS_COMPLETED = "STATUS_COMPLETED"
+    STATUS_FAILED = "STATUS_FAILED"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "В очереди"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_COMPLETED, "Завершена"),
+        (STATUS_FAILED, "Ошибка"),
+    )
+
+    achievement = models.ForeignKey(
+        Achievement, on_delete=models.CASCADE, related_name="award_jobs"
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    awarded_count = models.PositiveIntegerField(default=0)
+    last_user_id = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
 
     def __str__(self):
-        return f"{self.user} — {self.achievement.code}"
+        return f"{self.achievement} — {self.get_status_display()}"
+
+
+def get_achievement_rules():
+    """
+    Условия активных достижений [(achievement_id, metric, threshold)] из кэша.
+    Сбрасываются при сохранении или удалении достижения и в миграциях,
+    меняющих условия.
+    """
+    rules = cache.get(ACHIEVEMENT_RULES_KEY)
+    if rules is None:
+        rules = list(
+            Achievement.objects.filter(is_active=True)
+            .exclude(metric="")
+            .values_list("pk", "metric", "threshold")
+        )
+        cache.set(ACHIEVEMENT_RULES_KEY, rules, ACHIEVEMENT_RULES_TIMEOUT)
+    return rules
+
+
+def forget_achievement_rules():
+    transaction.on_commit(lambda: cache.delete(ACHIEVEMENT_RULES_KEY))
+
+
+def award_achievements(user_ids, *, events=None, dry_run=False):
+    """
+    Массово выдаёт пользователям заработанные активные достижения.
+    Все условия считаются одним запросом на нужные им метрики и сравниваются
+    в памяти; плюс один запрос на уже выданные и одна вставка.
+    С events проверяются только условия, которые эти события могут изменить.
+
+    Возвращает список новых UserAchievement: вставленных этим вызовом,
+    а при dry_run — не сохранённых кандидатов.
+    """
+    rules = [
+        rule
+        for rule in get_achievement_rules()
+        if events is None or METRIC_EVENTS[rule[1]].intersection(events)
+    ]
+    if not rules or not user_ids:
+        return []
+
+    metrics = get_users_metrics(user_ids, {metric for _, metric, _ in rules})
+    awarded = set(
+        UserAchievement.objects.filter(
+            user_id__in=user_ids,
+            achievement_id__in=[achievement_id for achievement_id, _, _ in rules],
+        ).values_list("user_id", "achievement_id")
+    )
+    new_awards = [
+        UserAchievement(user_id=user_id, achievement_id=achievement_id)
+        for user_id, user_metrics in metrics.items()
+        for achievement_id, metric, threshold in rules
+        if (user_id, achievement_id) not in awarded
+        and user_metrics[metric] >= threshold
+    ]
+    if new_awards and not dry_run:
+        new_awards = insert_user_achievements(new_awards)
+        handle_achievements_awarded(new_awards)
+    return new_awards
+
+
+def insert_user_achievements(awards):
+    """
+    Сохраняет выдачи одним INSERT ... ON CONFLICT DO NOTHING RETURNING и
+    возвращает только вставленные этим запросом (с pk). Выдачи, уже
+    сохранённые параллельной проверкой, пропускаются: события, рейтинги
+    и счётчики по ним не должны учитываться второй раз.
+    """
+    if not awards:
+        return []
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {UserAchievement._meta.db_table}
+                (user_id, achievement_id, awarded_at, is_notified,
+                 notification_error, created_at, updated_at)
+            SELECT award.user_id, award.achievement_id, %s, false, '', %s, %s
+            FROM unnest(%s::bigint[], %s::bigint[])
+                AS award (user_id, achievement_id)
+            ON CONFLICT (user_id, achievement_id) DO NOTHING
+            RETURNING id, user_id, achievement_id
+            """,
+            [
+                now,
+                now,
+                now,
+                [award.user_id for award in awards],
+                [award.achievement_id for award in awards],
+            ],
+        )
+        rows = cursor.fetchall()
+    return [
+        UserAchievement(
+            pk=pk,
+            user_id=user_id,
+            achievement_id=achievement_id,
+            awarded_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+        for pk, user_id, achievement_id in rows
+    ]
+
+
+def get_awarded_achievement_ids(user_id):
+    """
+    Множество id выданных пользователю достижений из кэша;
+    при промахе читается одним запросом.
+    """
+    key = AWARDED_ACHIEVEMENTS_KEY.format(user_id=user_id)
+    achievement_ids = cache.get(key)
+    if achievement_ids is None:
+        achievement_ids = frozenset(
+            UserAchievement.objects.filter(user_id=user_id).values_list(
+                "achievement_id", flat=True
+            )
+        )
+        cache.set(key, achievement_ids, AWARDED_ACHIEVEMENTS_TIMEOUT)
+    return achievement_ids
+
+
+def handle_achievements_awarded(awards):
+    """
+    То, что при массовой выдаче не сделают сигналы post_save:
+    версии состояния обучения, кэш выданных, события и рейтинги.
+    """
+    user_ids = {award.user_id for award in awards}
+    bump_learning_state_version(user_ids)
+    forget_awarded_achievement_ids(user_ids)
+    publish_achievements_awarded(awards)
+    record_achievements_awarded(awards)
+
+
+def forget_awarded_achievement_ids(user_ids):
+    """
+    Сбрасывает закэшированные множества после коммита записи UserAchievement.
+    """
+    keys = [AWARDED_ACHIEVEMENTS_KEY.format(user_id=user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
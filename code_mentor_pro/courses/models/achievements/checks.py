@@ -1,73 +1,114 @@
-def has_enrolled_in_first_course(user) -> bool:
+METRIC_ENROLLMENTS = "enrollments"
+METRIC_COMPLETED_SURVEYS = "completed_surveys"
+METRIC_COMPLETED_LESSONS = "completed_lessons"
+METRIC_LONGEST_STREAK = "longest_streak"
+METRIC_CHOICES = [
+    (METRIC_ENROLLMENTS, "Записей на курсы"),
+    (METRIC_COMPLETED_SURVEYS, "Пройденных опросов"),
+    (METRIC_COMPLETED_LESSONS, "Пройденных уроков"),
+    (METRIC_LONGEST_STREAK, "Дней активности подряд"),
+]
+# Метрики, которые считаются запросом к БД (get_metric_source) и поэтому
+# поддерживают выдачу задним числом. Серии активности хранятся в Redis
+# (courses.streaks)
+SQL_METRICS = [METRIC_ENROLLMENTS, METRIC_COMPLETED_SURVEYS, METRIC_COMPLETED_LESSONS]
+
+EVENT_ENROLL = "enroll"
+EVENT_LESSON_COMPLETED = "lesson_completed"
+EVENT_SURVEY_COMPLETED = "survey_completed"
+EVENT_MATERIAL_COMPLETED = "material_completed"
+
+# События, после которых может измениться метрика
+METRIC_EVENTS = {
+    METRIC_ENROLLMENTS: {EVENT_ENROLL},
+    METRIC_COMPLETED_SURVEYS: {EVENT_SURVEY_COMPLETED},
+    METRIC_COMPLETED_LESSONS: {EVENT_LESSON_COMPLETED},
+    METRIC_LONGEST_STREAK: {
+        EVENT_MATERIAL_COMPLETED,
+        EVENT_LESSON_COMPLETED,
+        EVENT_SURVEY_COMPLETED,
+    },
+}
+
+
+def get_metric_source(metric):
     """
-    Пользователь зачислен на свой первый курс
+    Строки, которые считает метрика, и путь от них к пользователю.
     """
-    from courses.models import UserCourse
-
-    return UserCourse.objects.filter(user=user).exists()
-
-
-def has_completed_first_survey(user) -> bool:
-    """
-    Пользователь прошел свой первый опрос
-    """
-    from courses.models import UserCourseSurvey
-
-    return UserCourseSurvey.objects.filter(
-        user_course__user=user, status=UserCourseSurvey.STATUS_COMPLETED
-    ).exists()
-
-
-def has_completed_first_lesson(user) -> bool:
+    from courses.models import UserCourse, UserCourseLesson, UserCourseSurvey
+
+    if metric == METRIC_ENROLLMENTS:
+        return UserCourse.objects.all(), "user"
+    if metric == METRIC_COMPLETED_SURVEYS:
+        return (
+            UserCourseSurvey.objects.filter(status=UserCourseSurvey.STATUS_COMPLETED),
+            "user_course__user",
+        )
+    if metric == METRIC_COMPLETED_LESSONS:
+        return (
+            UserCourseLesson.objects.filter(status=UserCourseLesson.STATUS_COMPLETED),
+            "user_course__user",
+        )
+    msg = f"Unknown achievement metric: {metric}"
+    raise ValueError(msg)
+
+
+def get_users_metrics(user_ids, metrics=None):
     """
-    Пользователь прошел свой первый урок
+    Метрики пользователей для массовой проверки достижений одним запросом
+    (серии активности — одним конвейером Redis): {user_id: {metric: value}}.
+    metrics — какие метрики считать (по умолчанию все).
     """
-    from courses.models import UserCourseLesson
-
-    return UserCourseLesson.objects.filter(
-        user_course__user=user, status=UserCourseLesson.STATUS_COMPLETED
-    ).exists()
-
-
-def has_completed_five_surveys(user) -> bool:
-    from courses.models import UserCourseSurvey
-
-    return (
-        UserCourseSurvey.objects.filter(
-            user_course__user=user, status=UserCourseSurvey.STATUS_COMPLETED
-        ).count()
-        >= 5
+    from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+
+    from code_mentor_pro.users.models import User
+
+    def count_for_user(metric):
+        queryset, user_field = get_metric_source(metric)
+        return Coalesce(
+            Subquery(
+                queryset.filter(**{user_field: OuterRef("pk")})
+                .order_by()
+                .values(user_field)
+                .annotate(total=Count("pk"))
+                .values("total"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    metrics = list(METRIC_EVENTS if metrics is None else metrics)
+    sql_metrics = [metric for metric in metrics if metric in SQL_METRICS]
+    users = User.objects.filter(pk__in=user_ids).annotate(
+        **{metric: count_for_user(metric) for metric in sql_metrics}
     )
+    result = {user["pk"]: user for user in users.values("pk", *sql_metrics)}
 
+    if METRIC_LONGEST_STREAK in metrics:
+        from courses.streaks import get_users_streaks
 
-def has_completed_ten_surveys(user) -> bool:
-    from courses.models import UserCourseSurvey
-
-    return (
-        UserCourseSurvey.objects.filter(
-            user_course__user=user, status=UserCourseSurvey.STATUS_COMPLETED
-        ).count()
-        >= 10
-    )
-
+        for user_id, streaks in get_users_streaks(result).items():
+            result[user_id][METRIC_LONGEST_STREAK] = streaks["longest_streak"]
+    return result
 
-def has_completed_five_lessons(user) -> bool:
-    from courses.models import UserCourseLesson
 
-    return (
-        UserCourseLesson.objects.filter(
-            user_course__user=user, status=UserCourseLesson.STATUS_COMPLETED
-        ).count()
-        >= 5
-    )
-
-
-def has_completed_ten_lessons(user) -> bool:
-    from courses.models import UserCourseLesson
+def get_qualifying_user_ids(metric, threshold, *, exclude_user_ids=None, after=0):
+    """
+    Queryset id пользователей с метрикой не меньше порога, одним
+    сгруппированным запросом (GROUP BY ... HAVING), по возрастанию id
+    начиная после after. exclude_user_ids — queryset уже получивших.
+    """
+    from django.db.models import Count
 
+    queryset, user_field = get_metric_source(metric)
+    queryset = queryset.filter(**{f"{user_field}__gt": after})
+    if exclude_user_ids is not None:
+        queryset = queryset.exclude(**{f"{user_field}__in": exclude_user_ids})
     return (
-        UserCourseLesson.objects.filter(
-            user_course__user=user, status=UserCourseLesson.STATUS_COMPLETED
-        ).count()
-        >= 10
+        queryset.order_by(user_field)
+        .values(user_field)
+        .annotate(total=Count("pk"))
+        .filter(total__gte=threshold)
+        .values_list(user_field, flat=True)
     )
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from django.db import models
+
+from .progress import annotate_progress, get_progress_counters
+
+if TYPE_CHECKING:
+    from courses.models import UserCourseProgress
+
+
+class CourseQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(is_published=True)
+
+    def with_is_enrolled(self, user):
+        """
+        Курсы с is_enrolled — записан ли пользователь — подзапросом EXISTS
+        в том же запросе. Для анонимного пользователя всегда False.
+        """
+        from courses.models import UserCourse
+
+        if not user.is_authenticated:
+            return self.annotate(is_enrolled=models.Value(False))
+        return self.annotate(
+            is_enrolled=models.Exists(
+                UserCourse.objects.filter(user=user, course=models.OuterRef("pk"))
+            )
+        )
+
+    def facet_counts(self, facets, selected):
+        """
+        Число курсов по значениям каждого фасета при выбранных значениях
+        остальных (selected: {facet: value}) одним GROUP BY по всем фасетам:
+        {facet: [{"value", "count"}]}. Незаполненные значения не учитываются.
+        """
+        counts: dict[str, defaultdict[object, int]] = {
+            facet: defaultdict(int) for facet in facets
+        }
+        rows = self.order_by().values(*facets).annotate(count=models.Count("pk"))
+        for row in rows:
+            for facet in facets:
+                if row[facet] is not None and all(
+                    row[other] == value
+                    for other, value in selected.items()
+                    if other != facet
+                ):
+                    counts[facet][row[facet]] += row["count"]
+        return {
+            facet: [
+                {"value": value, "count": count}
+                for value, count in sorted(values.items())
+            ]
+            for facet, values in counts.items()
+        }
+
+
+class UserCourseQuerySet(models.QuerySet):
+    def with_progress(self):
+        """
+        Пользовательские курсы с прогрессом, посчитанным в том же запросе.
+        """
+        return annotate_progress(self)
+
+
+class UserCourseProgressManager(models.Manager["UserCourseProgress"]):
+    def build(self, user_courses):
+        """
+        Считает счётчики и битовые карты для пользовательских курсов
+        по закэшированным снимкам структуры (без сохранения).
+        """
+        return [
+            self.model(user_course_id=user_course_id, **progress)
+            for user_course_id, progress in get_progress_counters(user_courses).items()
+        ]
+
+    def refresh(self, user_courses):
+        """
+        Пересчитывает и сохраняет прогресс одним upsert на все
+        переданные пользовательские курсы.
+        """
+        progress = self.build(user_courses)
+        self.upsert(progress)
+        return progress
+
+    def upsert(self, progress):
+        if progress:
+            self.bulk_create(
+                progress,
+                update_conflicts=True,
+                unique_fields=["user_course"],
+                update_fields=[*self.model.PROGRESS_FIELDS, "updated_at"],
+            )
+
+    def get_current(self, user_course, structure):
+        """
+        Прогресс с битовыми картами в актуальной раскладке курса,
+        при необходимости пересчитанный.
+        """
+        progress = self.filter(user_course=user_course).first()
+        if progress is None or progress.bitmap_layout != structure.layout:
+            (progress,) = self.refresh([user_course])
+        return progress
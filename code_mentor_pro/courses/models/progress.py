@@ -0,0 +1,290 @@
+from collections import defaultdict
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import (Case, Count, Exists, F, IntegerField, OuterRef, Q,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, JSONObject
+
+
+def lesson_progress_queryset(user_course_ref):
+    """
+    Уроки, аннотированные прогрессом пользователя:
+    - surveys_total: количество опросов урока
+    - surveys_completed: количество завершённых пользователем опросов урока
+    - is_completed: 1, если урок завершён, иначе 0
+
+    Урок считается завершенным если:
+    - нет опросов и статус lesson == COMPLETED
+    - или все опросы завершены
+
+    user_course_ref — id пользовательского курса или выражение (OuterRef),
+    поэтому queryset можно использовать и как подзапрос.
+    """
+    from courses.models import Lesson, UserCourseLesson, UserCourseSurvey
+
+    lesson_surveys = (
+        Lesson.surveys.through.objects.filter(lesson_id=OuterRef("pk"))
+        .order_by()
+        .values("lesson_id")
+        .annotate(total=Count("survey_id"))
+        .values("total")
+    )
+    completed_surveys = (
+        UserCourseSurvey.objects.filter(
+            user_course_id=user_course_ref,
+            survey__lessons=OuterRef("pk"),
+            status=UserCourseSurvey.STATUS_COMPLETED,
+        )
+        .order_by()
+        .values("user_course_id")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    lesson_marked_completed = UserCourseLesson.objects.filter(
+        user_course_id=user_course_ref,
+        lesson_id=OuterRef("pk"),
+        status=UserCourseLesson.STATUS_COMPLETED,
+    )
+
+    return (
+        Lesson.objects.order_by()
+        .annotate(
+            surveys_total=Coalesce(Subquery(lesson_surveys), Value(0)),
+            surveys_completed=Coalesce(Subquery(completed_surveys), Value(0)),
+            is_marked_completed=Exists(lesson_marked_completed),
+        )
+        .annotate(
+            is_completed=Case(
+                When(Q(surveys_total=0, is_marked_completed=True), then=Value(1)),
+                When(
+                    Q(surveys_total__gt=0, surveys_completed=F("surveys_total")),
+                    then=Value(1),
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+    )
+
+
+def build_counters_details(
+    total_lessons, completed_lessons, total_surveys, completed_surveys
+):
+    total_lessons = total_lessons or 0
+    completed_lessons = completed_lessons or 0
+    total_surveys = total_surveys or 0
+    completed_surveys = completed_surveys or 0
+
+    total_steps = total_lessons + total_surveys
+    completed_steps = completed_lessons + completed_surveys
+
+    progress_percent = round(completed_steps / total_steps * 100) if total_steps else 0
+
+    return {
+        "total_lessons": total_lessons,
+        "completed_lessons": completed_lessons,
+        "total_surveys": total_surveys,
+        "completed_surveys": completed_surveys,
+        "progress_percent": progress_percent,
+    }
+
+
+def build_progress_details(
+    total_lessons, completed_lessons, total_surveys, completed_surveys, modules=()
+):
+    """
+    Собирает словарь прогресса в формате UserCourse.get_progress_details.
+    modules — счётчики по модулям в порядке курса (module_id и те же поля).
+    """
+    return {
+        **build_counters_details(
+            total_lessons, completed_lessons, total_surveys, completed_surveys
+        ),
+        "modules": [
+            {
+                "module_id": module["module_id"],
+                **build_counters_details(
+                    module["total_lessons"],
+                    module["completed_lessons"],
+                    module["total_surveys"],
+                    module["completed_surveys"],
+                ),
+            }
+            for module in modules or ()
+        ],
+    }
+
+
+def make_bitmap(positions):
+    """
+    Битовая карта (bytes) с установленными битами на позициях positions.
+    """
+    value = 0
+    for position in positions:
+        value |= 1 << position
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def bitmap_positions(bitmap):
+    value = int.from_bytes(bitmap, "little")
+    return [position for position in range(value.bit_length()) if value >> position & 1]
+
+
+def calculate_progress(structure, completed_lesson_ids, completed_survey_ids):
+    """
+    Считает прогресс по снимку структуры курса и множествам завершённых
+    пользователем уроков и опросов.
+
+    Возвращает счётчики (общие и по модулям) и битовые карты завершённых
+    уроков и пар (урок, опрос) в раскладке structure.layout.
+    """
+    completed_slots = {
+        position
+        for position, (_, survey_id) in enumerate(structure.survey_slots)
+        if survey_id in completed_survey_ids
+    }
+    completed_lessons = set()
+    module_progress = []
+    lesson_position = 0
+    position = 0
+    for module in structure.modules:
+        counters = {
+            "module_id": module["id"],
+            "total_lessons": len(module["lessons"]),
+            "completed_lessons": 0,
+            "total_surveys": 0,
+            "completed_surveys": 0,
+        }
+        for lesson in module["lessons"]:
+            survey_positions = range(position, position + len(lesson["survey_ids"]))
+            position = survey_positions.stop
+            completed = sum(p in completed_slots for p in survey_positions)
+            counters["total_surveys"] += len(survey_positions)
+            counters["completed_surveys"] += completed
+
+            if survey_positions:
+                lesson_completed = completed == len(survey_positions)
+            else:
+                lesson_completed = lesson["id"] in completed_lesson_ids
+            if lesson_completed:
+                completed_lessons.add(lesson_position)
+                counters["completed_lessons"] += 1
+            lesson_position += 1
+        module_progress.append(counters)
+
+    return {
+        "total_lessons": len(structure.lesson_positions),
+        "completed_lessons": len(completed_lessons),
+        "total_surveys": len(structure.survey_slots),
+        "completed_surveys": len(completed_slots),
+        "module_progress": module_progress,
+        "completed_lessons_bitmap": make_bitmap(completed_lessons),
+        "completed_surveys_bitmap": make_bitmap(completed_slots),
+        "bitmap_layout": structure.layout,
+    }
+
+
+def get_progress_counters(user_courses):
+    """
+    Счётчики прогресса по снимкам структуры курсов: {user_course_id: counters}.
+    Два запроса на завершённые уроки и опросы для всех переданных курсов.
+    """
+    from courses.models import UserCourseLesson, UserCourseSurvey
+
+    from .structure import get_course_structure
+
+    course_ids = {user_course.pk: user_course.course_id for user_course in user_courses}
+    completed_lesson_ids = defaultdict(set)
+    completed_survey_ids = defaultdict(set)
+    for user_course_id, lesson_id in UserCourseLesson.objects.filter(
+        user_course_id__in=course_ids, status=UserCourseLesson.STATUS_COMPLETED
+    ).values_list("user_course_id", "lesson_id"):
+        completed_lesson_ids[user_course_id].add(lesson_id)
+    for user_course_id, survey_id in UserCourseSurvey.objects.filter(
+        user_course_id__in=course_ids, status=UserCourseSurvey.STATUS_COMPLETED
+    ).values_list("user_course_id", "survey_id"):
+        completed_survey_ids[user_course_id].add(survey_id)
+
+    structures = {
+        course_id: get_course_structure(course_id)
+        for course_id in set(course_ids.values())
+    }
+    return {
+        user_course_id: calculate_progress(
+            structures[course_id],
+            completed_lesson_ids[user_course_id],
+            completed_survey_ids[user_course_id],
+        )
+        for user_course_id, course_id in course_ids.items()
+    }
+
+
+def get_user_course_progress(user_course):
+    """
+    Считает прогресс по курсу по закэшированной структуре курса.
+    """
+    counters = get_progress_counters([user_course])[user_course.pk]
+    return build_progress_details(
+        total_lessons=counters["total_lessons"],
+        completed_lessons=counters["completed_lessons"],
+        total_surveys=counters["total_surveys"],
+        completed_surveys=counters["completed_surveys"],
+        modules=counters["module_progress"],
+    )
+
+
+def annotate_progress(queryset):
+    """
+    Добавляет к queryset пользовательских курсов поля прогресса
+    (progress_total_lessons, progress_completed_lessons, progress_total_surveys,
+    progress_completed_surveys и progress_modules — те же счётчики по модулям).
+    Прогресс по всем курсам считается одним запросом.
+    """
+    from courses.models import Module
+
+    def lessons_total(lessons, group_by, aggregate):
+        return Coalesce(
+            Subquery(
+                lessons.values(group_by).annotate(total=aggregate).values("total")
+            ),
+            Value(0),
+        )
+
+    def counters(lessons, group_by):
+        return {
+            "total_lessons": lessons_total(lessons, group_by, Count("pk")),
+            "completed_lessons": lessons_total(lessons, group_by, Sum("is_completed")),
+            "total_surveys": lessons_total(lessons, group_by, Sum("surveys_total")),
+            "completed_surveys": lessons_total(
+                lessons, group_by, Sum("surveys_completed")
+            ),
+        }
+
+    course_lessons = lesson_progress_queryset(OuterRef(OuterRef("pk"))).filter(
+        module__course_id=OuterRef("course_id")
+    )
+    module_lessons = lesson_progress_queryset(
+        OuterRef(OuterRef(OuterRef("pk")))
+    ).filter(module_id=OuterRef("pk"))
+    modules = (
+        Module.objects.filter(course_id=OuterRef("course_id"))
+        .order_by("order", "pk")
+        .annotate(**counters(module_lessons, "module_id"))
+        .values(
+            json=JSONObject(
+                module_id="pk",
+                total_lessons="total_lessons",
+                completed_lessons="completed_lessons",
+                total_surveys="total_surveys",
+                completed_surveys="completed_surveys",
+            )
+        )
+    )
+
+    return queryset.annotate(
+        **{
+            f"progress_{name}": value
+            for name, value in counters(course_lessons, "module__course_id").items()
+        },
+        progress_modules=ArraySubquery(modules),
+    )
@@ -0,0 +1,93 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.db import models
+from django.db.models import F
+
+SEARCH_CONFIG = "russian"
+
+
+def search_vector_field(*weighted_fields):
+    """
+    Поисковый вектор по полям [(field, weight)], который Postgres
+    пересчитывает сам при каждой записи строки (сохраняемый генерируемый
+    столбец), поэтому он всегда актуален и не требует отдельных UPDATE.
+    """
+    expression = reduce(
+        operator.add,
+        (
+            SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+            for field, weight in weighted_fields
+        ),
+    )
+    return models.GeneratedField(
+        expression=expression, output_field=SearchVectorField(), db_persist=True
+    )
+
+
+def search(queryset, text):
+    """
+    Строки queryset, подходящие под запрос text (синтаксис websearch:
+    "фраза", -исключение, or), по убыванию релевантности (поле rank).
+    """
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "pk")
+    )
+
+
+def search_learning_content(
+    text, *, level=None, programming_language=None, language=None, limit=20
+):
+    """
+    Поиск по опубликованным курсам, урокам и материалам: по запросу
+    на каждую модель, каждый — по GIN-индексу search_vector.
+    level и programming_language фильтруют курсы (и их уроки и материалы),
+    language — материалы.
+    """
+    from courses.models import Course, Lesson, Material
+
+    course_filters = {"is_published": True}
+    if level:
+        course_filters["level"] = level
+    if programming_language:
+        course_filters["programming_language"] = programming_language
+
+    def through(prefix):
+        return {f"{prefix}__{key}": value for key, value in course_filters.items()}
+
+    materials = Material.objects.filter(**through("lesson__module__course"))
+    if language:
+        materials = materials.filter(language=language)
+
+    return {
+        "courses": list(
+            search(Course.objects.filter(**course_filters), text).values(
+                "id", "title", "slug", "short_description", "rank"
+            )[:limit]
+        ),
+        "lessons": list(
+            search(Lesson.objects.filter(**through("module__course")), text).values(
+                "id",
+                "title",
+                "module_id",
+                "rank",
+                course_slug=F("module__course__slug"),
+            )[:limit]
+        ),
+        "materials": list(
+            search(materials, text).values(
+                "id",
+                "title",
+                "language",
+                "material_type",
+                "lesson_id",
+                "rank",
+                course_slug=F("lesson__module__course__slug"),
+            )[:limit]
+        ),
+    }
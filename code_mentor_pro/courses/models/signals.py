@@ -1,23 +1,325 @@
-from django.db.models.signals import post_save
+from functools import partial
+from weakref import WeakKeyDictionary
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
 from django.dispatch import receiver
 
-from courses.models import UserCourse, UserCourseLesson, UserCourseSurvey
-from courses.tasks import check_user_achievements_task
+from courses.events import (publish_achievements_awarded,
+                            publish_progress_changed)
+from courses.leaderboards import (record_achievements_awarded,
+                                  record_completion_change,
+                                  record_completion_changes)
+from courses.models import (EVENT_ENROLL, EVENT_LESSON_COMPLETED,
+                            EVENT_MATERIAL_COMPLETED, EVENT_SURVEY_COMPLETED,
+                            METRIC_COMPLETED_LESSONS, METRIC_COMPLETED_SURVEYS,
+                            SQL_METRICS, Achievement, Course, Lesson,
+                            Material, Module, Survey, UserAchievement,
+                            UserCourse, UserCourseLesson,
+                            UserCourseLessonMaterial, UserCourseProgress,
+                            UserCourseSurvey, forget_achievement_rules,
+                            forget_awarded_achievement_ids)
+from courses.models.structure import bump_course_structure_version
+from courses.models.versions import (bump_achievements_version,
+                                     bump_catalog_version,
+                                     bump_course_content_versions,
+                                     bump_learning_state_version)
+from courses.streaks import record_activity
+from courses.tasks import (dispatch_achievement_check,
+                           refresh_course_progress_task,
+                           start_achievement_award_job)
+
+
+def dispatch_achievement_check_on_commit(user_id, event):
+    transaction.on_commit(lambda: dispatch_achievement_check(user_id, event))
 
 
 @receiver(post_save, sender=UserCourse)
 def handle_user_course_enrolled(sender, instance, created, **kwargs):
     if created:
-        check_user_achievements_task.delay(instance.user.id)
+        dispatch_achievement_check_on_commit(instance.user_id, EVENT_ENROLL)
 
 
 @receiver(post_save, sender=UserCourseSurvey)
 def handle_survey_completed(sender, instance, **kwargs):
-    if instance.status == instance.STATUS_COMPLETED:
-        check_user_achievements_task.delay(instance.user_course.user.id)
+    if instance.has_transitioned_to(instance.STATUS_COMPLETED):
+        record_activity(instance.user_course.user_id)
+        dispatch_achievement_check_on_commit(
+            instance.user_course.user_id, EVENT_SURVEY_COMPLETED
+        )
 
 
 @receiver(post_save, sender=UserCourseLesson)
 def handle_lesson_completed(sender, instance, **kwargs):
+    if instance.has_transitioned_to(instance.STATUS_COMPLETED):
+        record_activity(instance.user_course.user_id)
+        dispatch_achievement_check_on_commit(
+            instance.user_course.user_id, EVENT_LESSON_COMPLETED
+        )
+
+
+@receiver(post_save, sender=UserCourseLessonMaterial)
+def handle_material_completed(sender, instance, **kwargs):
+    if instance.has_transitioned_to(instance.STATUS_COMPLETED):
+        user_id = instance.user_course_lesson.user_course.user_id
+        record_activity(user_id)
+        dispatch_achievement_check_on_commit(user_id, EVENT_MATERIAL_COMPLETED)
+
+
+# Рейтинги (courses.leaderboards) по тем же переходам статусов
+
+LEADERBOARD_METRICS = {
+    UserCourseLesson: METRIC_COMPLETED_LESSONS,
+    UserCourseSurvey: METRIC_COMPLETED_SURVEYS,
+}
+
+
+@receiver(post_save, sender=UserCourseLesson)
+@receiver(post_save, sender=UserCourseSurvey)
+def handle_leaderboard_status_changed(sender, instance, **kwargs):
+    if instance.status_transition is None:
+        return
+    previous, current = instance.status_transition
+    delta = (current == instance.STATUS_COMPLETED) - (
+        previous == instance.STATUS_COMPLETED
+    )
+    if delta:
+        user_course = instance.user_course
+        record_completion_change(
+            user_course.user_id,
+            user_course.course_id,
+            LEADERBOARD_METRICS[sender],
+            delta,
+        )
+
+
+# Завершённые статусы текущего удаления (в том числе каскадом от урока,
+# опроса или пользовательского курса): origin → [(user_course_id, metric)]
+deleted_completions: WeakKeyDictionary = WeakKeyDictionary()
+
+
+@receiver(pre_delete, sender=UserCourseLesson)
+@receiver(pre_delete, sender=UserCourseSurvey)
+def collect_leaderboard_status_deleted(sender, instance, origin, **kwargs):
     if instance.status == instance.STATUS_COMPLETED:
-        check_user_achievements_task.delay(instance.user_course.user.id)
+        deleted_completions.setdefault(origin, []).append(
+            (instance.user_course_id, LEADERBOARD_METRICS[sender])
+        )
+
+
+@receiver(post_delete, sender=UserCourseLesson)
+@receiver(post_delete, sender=UserCourseSurvey)
+def handle_leaderboard_status_deleted(sender, instance, origin, **kwargs):
+    """
+    Все pre_delete удаления приходят раньше первого post_delete, а
+    пользовательские курсы удаляются после своих статусов, поэтому
+    пользователи и курсы всех собранных статусов читаются здесь
+    одним запросом.
+    """
+    completions = deleted_completions.pop(origin, None)
+    if not completions:
+        return
+    user_courses = {
+        pk: (user_id, course_id)
+        for pk, user_id, course_id in UserCourse.objects.filter(
+            pk__in={user_course_id for user_course_id, _ in completions}
+        ).values_list("pk", "user_id", "course_id")
+    }
+    record_completion_changes(
+        (*user_courses[user_course_id], metric, -1)
+        for user_course_id, metric in completions
+    )
+
+
+# Счётчики прогресса и снимок структуры курса
+
+
+def is_cascade_delete(instance, origin):
+    """
+    Удаление пришло каскадом от родительского объекта (курса, урока и т.п.).
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not type(instance)
+
+
+def refresh_user_course_progress(user_course):
+    (progress,) = UserCourseProgress.objects.refresh([user_course])
+    publish_progress_changed(user_course, progress)
+
+
+def handle_course_structure_changed(course_ids, *, affects_progress=True):
+    """
+    Сбрасывает снимок структуры курсов и после коммита пересчитывает
+    прогресс всех записавшихся на них.
+    """
+    course_ids = set(course_ids)
+    bump_course_content_versions(course_ids)
+    for course_id in course_ids:
+        bump_course_structure_version(course_id)
+        if affects_progress:
+            transaction.on_commit(
+                partial(refresh_course_progress_task.delay, course_id)
+            )
+
+
+def get_lessons_course_ids(lesson_ids):
+    return Module.objects.filter(lessons__id__in=lesson_ids).values_list(
+        "course_id", flat=True
+    )
+
+
+@receiver(post_save, sender=UserCourse)
+def handle_user_course_progress_created(sender, instance, created, **kwargs):
+    if created:
+        refresh_user_course_progress(instance)
+
+
+@receiver(post_save, sender=UserCourseLesson)
+@receiver(post_save, sender=UserCourseSurvey)
+def handle_user_course_status_saved(sender, instance, **kwargs):
+    if instance.status_transition is not None:
+        refresh_user_course_progress(instance.user_course)
+
+
+@receiver(post_delete, sender=UserCourseLesson)
+@receiver(post_delete, sender=UserCourseSurvey)
+def handle_user_course_status_deleted(sender, instance, origin, **kwargs):
+    if not is_cascade_delete(instance, origin):
+        refresh_user_course_progress(instance.user_course)
+
+
+@receiver(post_save, sender=Course)
+def handle_course_saved(sender, instance, **kwargs):
+    handle_course_structure_changed([instance.pk], affects_progress=False)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def handle_catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Module)
+def handle_module_saved(sender, instance, **kwargs):
+    handle_course_structure_changed([instance.course_id], affects_progress=False)
+
+
+@receiver(post_delete, sender=Module)
+def handle_module_deleted(sender, instance, origin, **kwargs):
+    if not is_cascade_delete(instance, origin):
+        handle_course_structure_changed([instance.course_id])
+
+
+@receiver(post_save, sender=Lesson)
+def handle_lesson_saved(sender, instance, **kwargs):
+    handle_course_structure_changed([instance.module.course_id])
+
+
+@receiver(post_delete, sender=Lesson)
+def handle_lesson_deleted(sender, instance, origin, **kwargs):
+    if not is_cascade_delete(instance, origin):
+        handle_course_structure_changed(
+            Module.objects.filter(pk=instance.module_id).values_list(
+                "course_id", flat=True
+            )
+        )
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def handle_material_changed(sender, instance, **kwargs):
+    handle_course_structure_changed(
+        get_lessons_course_ids([instance.lesson_id]), affects_progress=False
+    )
+
+
+@receiver(m2m_changed, sender=Lesson.surveys.through)
+def handle_lesson_surveys_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Строки промежуточной таблицы не отправляют post_save/post_delete.
+    # Инлайн опросов в админке сохраняет урок, и пересчёт запускает
+    # handle_lesson_saved уже после сохранения инлайнов (on_commit)
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        lesson_ids = [instance.pk]
+    elif action == "pre_clear":
+        lesson_ids = list(instance.lessons.values_list("pk", flat=True))
+    else:
+        lesson_ids = pk_set
+    if lesson_ids:
+        handle_course_structure_changed(get_lessons_course_ids(lesson_ids))
+
+
+@receiver(pre_delete, sender=Survey)
+def handle_survey_deleted(sender, instance, **kwargs):
+    handle_course_structure_changed(
+        get_lessons_course_ids(instance.lessons.values_list("pk", flat=True))
+    )
+
+
+# Версия состояния обучения пользователя (ETag прогресса и достижений)
+
+
+@receiver(post_save, sender=UserCourse)
+@receiver(post_delete, sender=UserCourse)
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_delete, sender=UserAchievement)
+def handle_user_learning_state_changed(sender, instance, **kwargs):
+    bump_learning_state_version([instance.user_id])
+
+
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_delete, sender=UserAchievement)
+def handle_user_achievement_changed(sender, instance, **kwargs):
+    forget_awarded_achievement_ids([instance.user_id])
+    if kwargs.get("created"):
+        publish_achievements_awarded([instance])
+        record_achievements_awarded([instance])
+
+
+@receiver(post_delete, sender=UserAchievement)
+def handle_user_achievement_deleted(sender, instance, **kwargs):
+    record_achievements_awarded([instance], delta=-1)
+
+
+@receiver(post_save, sender=UserCourseLesson)
+@receiver(post_save, sender=UserCourseSurvey)
+def handle_user_course_status_learning_state_saved(sender, instance, **kwargs):
+    if instance.status_transition is not None:
+        bump_learning_state_version([instance.user_course.user_id])
+
+
+@receiver(post_delete, sender=UserCourseLesson)
+@receiver(post_delete, sender=UserCourseSurvey)
+def handle_user_course_status_learning_state_deleted(
+    sender, instance, origin, **kwargs
+):
+    if not is_cascade_delete(instance, origin):
+        bump_learning_state_version([instance.user_course.user_id])
+
+
+@receiver(post_save, sender=UserCourseLessonMaterial)
+@receiver(post_delete, sender=UserCourseLessonMaterial)
+def handle_material_learning_state_changed(sender, instance, **kwargs):
+    origin = kwargs.get("origin")
+    if origin is None or not is_cascade_delete(instance, origin):
+        bump_learning_state_version(
+            UserCourse.objects.filter(
+                lessons__id=instance.user_course_lesson_id
+            ).values_list("user_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def handle_achievement_changed(sender, instance, **kwargs):
+    forget_achievement_rules()
+    bump_achievements_version()
+
+
+@receiver(post_save, sender=Achievement)
+def handle_achievement_activated(sender, instance, **kwargs):
+    if instance.has_transitioned_to(True) and instance.metric in SQL_METRICS:
+        start_achievement_award_job(instance)
@@ -0,0 +1,117 @@
+import hashlib
+from typing import Any
+
+from django.core.cache import cache
+
+from .versions import bump_cache_versions, get_cache_version
+
+STRUCTURE_VERSION_KEY = "courses:structure-version:{course_id}"
+STRUCTURE_KEY = "courses:structure:{course_id}:{version}"
+STRUCTURE_TIMEOUT = 60 * 60 * 24
+
+
+class CourseStructure:
+    """
+    Снимок структуры курса: модули и уроки по порядку,
+    id опросов и материалов каждого урока.
+
+    Позиции уроков и пар (урок, опрос) в порядке курса задают номера битов
+    в битовых картах прогресса, layout — отпечаток этой раскладки.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.lessons_by_id = {
+            lesson["id"]: lesson
+            for module in data["modules"]
+            for lesson in module["lessons"]
+        }
+        self.lesson_positions = {
+            lesson_id: position
+            for position, lesson_id in enumerate(self.lessons_by_id)
+        }
+        self.survey_slots = [
+            (lesson["id"], survey_id)
+            for lesson in self.lessons_by_id.values()
+            for survey_id in lesson["survey_ids"]
+        ]
+        self.layout = hashlib.blake2b(
+            repr(self.survey_slots + list(self.lesson_positions)).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+    @property
+    def course_id(self):
+        return self.data["course_id"]
+
+    @property
+    def modules(self):
+        return self.data["modules"]
+
+    @property
+    def lessons(self):
+        return list(self.lessons_by_id.values())
+
+    def get_lesson(self, lesson_id):
+        return self.lessons_by_id.get(lesson_id)
+
+
+def get_course_structure_version(course_id):
+    return get_cache_version(STRUCTURE_VERSION_KEY.format(course_id=course_id))
+
+
+def bump_course_structure_version(course_id):
+    """
+    Меняет версию структуры курса после коммита, старый снимок
+    больше не читается и истекает сам.
+    """
+    bump_cache_versions([STRUCTURE_VERSION_KEY.format(course_id=course_id)])
+
+
+def build_course_structure(course_id):
+    from courses.models import Lesson, Material, Module
+
+    modules: dict[int, dict[str, Any]] = {
+        module["id"]: {**module, "lessons": []}
+        for module in Module.objects.filter(course_id=course_id)
+        .order_by("order", "pk")
+        .values("id", "title", "description", "order")
+    }
+    lessons: dict[int, dict[str, Any]] = {}
+    for lesson in (
+        Lesson.objects.filter(module__course_id=course_id)
+        .order_by("order", "pk")
+        .values("id", "module_id", "title", "description", "order")
+    ):
+        lesson_data: dict[str, Any] = {**lesson, "survey_ids": [], "material_ids": []}
+        lessons[lesson["id"]] = lesson_data
+        modules[lesson_data.pop("module_id")]["lessons"].append(lesson_data)
+
+    for lesson_id, survey_id in (
+        Lesson.surveys.through.objects.filter(lesson_id__in=lessons)
+        .order_by("survey_id")
+        .values_list("lesson_id", "survey_id")
+    ):
+        lessons[lesson_id]["survey_ids"].append(survey_id)
+    for lesson_id, material_id in (
+        Material.objects.filter(lesson_id__in=lessons)
+        .order_by("pk")
+        .values_list("lesson_id", "pk")
+    ):
+        lessons[lesson_id]["material_ids"].append(material_id)
+
+    return {"course_id": course_id, "modules": list(modules.values())}
+
+
+def get_course_structure(course_id):
+    """
+    Снимок структуры курса из кэша; при смене версии собирается заново.
+    """
+    key = STRUCTURE_KEY.format(
+        course_id=course_id, version=get_course_structure_version(course_id)
+    )
+    data = cache.get(key)
+    if data is None:
+        data = build_course_structure(course_id)
+        cache.set(key, data, STRUCTURE_TIMEOUT)
+    return CourseStructure(data)
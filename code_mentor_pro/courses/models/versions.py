@@ -0,0 +1,117 @@
+import hashlib
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+LEARNING_STATE_VERSION_KEY = "courses:learning-state-version:{user_id}"
+COURSE_CONTENT_VERSION_KEY = "courses:course-content-version:{course_id}"
+ACHIEVEMENTS_VERSION_KEY = "courses:achievements-version"
+# Курсы пользователя под версией его состояния обучения: запись на курс
+# и отписка меняют версию, поэтому список не устаревает
+ENROLLED_COURSES_KEY = "courses:enrolled-courses:{user_id}:{version}"
+ENROLLED_COURSES_TIMEOUT = 60 * 60 * 24
+CATALOG_VERSION_KEY = "courses:catalog-version"
+
+
+def get_cache_version(key):
+    """
+    Текущая версия из кэша; при отсутствии создаётся новая.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_cache_versions(keys):
+    """
+    Версии нескольких ключей одним обращением к кэшу (недостающие создаются).
+    """
+    versions = cache.get_many(keys)
+    return [versions.get(key) or get_cache_version(key) for key in keys]
+
+
+def bump_cache_versions(keys):
+    """
+    Меняет версии после коммита, чтобы читатели не закэшировали
+    данные до их сохранения.
+    """
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({key: uuid4().hex for key in keys}, timeout=None)
+        )
+
+
+def get_learning_state_version(user_id):
+    return get_cache_version(LEARNING_STATE_VERSION_KEY.format(user_id=user_id))
+
+
+def get_enrolled_course_ids(user_id, version):
+    from courses.models import UserCourse
+
+    key = ENROLLED_COURSES_KEY.format(user_id=user_id, version=version)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = sorted(
+            UserCourse.objects.filter(user_id=user_id).values_list(
+                "course_id", flat=True
+            )
+        )
+        cache.set(key, course_ids, ENROLLED_COURSES_TIMEOUT)
+    return course_ids
+
+
+def get_learning_progress_etag(user_id):
+    """
+    ETag прогресса пользователя: меняется при изменении его прогресса
+    и записей на курсы, а также содержимого только его курсов.
+    """
+    user_version = get_learning_state_version(user_id)
+    course_versions = get_cache_versions(
+        [
+            COURSE_CONTENT_VERSION_KEY.format(course_id=course_id)
+            for course_id in get_enrolled_course_ids(user_id, user_version)
+        ]
+    )
+    content_version = hashlib.md5(
+        "".join(course_versions).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{user_version}-{content_version}"
+
+
+def get_achievements_etag(user_id):
+    """
+    ETag достижений пользователя: меняется при изменении его достижений
+    и списка достижений (общего для всех).
+    """
+    user_version = get_learning_state_version(user_id)
+    return f"{user_version}-{get_cache_version(ACHIEVEMENTS_VERSION_KEY)}"
+
+
+def bump_learning_state_version(user_ids):
+    bump_cache_versions(
+        LEARNING_STATE_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids)
+    )
+
+
+def bump_course_content_versions(course_ids):
+    bump_cache_versions(
+        COURSE_CONTENT_VERSION_KEY.format(course_id=course_id)
+        for course_id in set(course_ids)
+    )
+
+
+def bump_achievements_version():
+    bump_cache_versions([ACHIEVEMENTS_VERSION_KEY])
+
+
+def get_catalog_version():
+    return get_cache_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    bump_cache_versions([CATALOG_VERSION_KEY])
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+from courses.models import UserAchievement
+
+ACHIEVEMENT_NOTIFICATION_BATCH_SIZE = 500
+
+
+def send_achievement_emails(awards):
+    """
+    Письма о новых достижениях одним соединением с почтовым бэкендом.
+    Возвращает {pk достижения: ошибка} для писем, которые не удалось отправить.
+    """
+    failures = {}
+    with get_connection() as connection:
+        for award in awards:
+            if not award.user.email:
+                continue
+            message = EmailMessage(
+                subject=f"Новое достижение: {award.achievement.title}",
+                body=award.achievement.description or award.achievement.title,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[award.user.email],
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:  # noqa: BLE001
+                failures[award.pk] = str(exc)
+    return failures
+
+
+# Каналы доставки: принимают пачку и возвращают {pk: ошибка} для
+# недоставленных. Во внутреннюю ленту (UserAchievementFeedView) достижение
+# попадает, когда помечено is_notified
+ACHIEVEMENT_NOTIFIERS = [send_achievement_emails]
+
+
+def deliver_achievement_notifications(batch_size=ACHIEVEMENT_NOTIFICATION_BATCH_SIZE):
+    """
+    Забирает пачку неотправленных достижений (SELECT ... FOR UPDATE SKIP LOCKED)
+    и в той же транзакции помечает их отправленными одним UPDATE.
+    Параллельные обработчики пропускают строки, захваченные другими.
+    Доставка по каналам идёт уже после коммита, поэтому сбой канала или
+    обработчика не приводит к повторной отправке всей пачки: ошибки
+    сохраняются в notification_error каждого недоставленного достижения.
+
+    Возвращает количество доставленных достижений.
+    """
+    with transaction.atomic():
+        awards = list(
+            UserAchievement.objects.filter(is_notified=False)
+            .select_related("user", "achievement")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("pk")[:batch_size]
+        )
+        if not awards:
+            return 0
+        UserAchievement.objects.filter(pk__in=[award.pk for award in awards]).update(
+            is_notified=True
+        )
+
+    failures: dict[int, str] = {}
+    for notify in ACHIEVEMENT_NOTIFIERS:
+        for pk, error in notify(awards).items():
+            failures.setdefault(pk, error)
+    if failures:
+        failed = [award for award in awards if award.pk in failures]
+        for award in failed:
+            award.notification_error = failures[award.pk]
+        UserAchievement.objects.bulk_update(failed, ["notification_error"])
+    return len(awards) - len(failures)
@@ -0,0 +1,85 @@
+import logging
+from datetime import date
+
+import redis
+from django.db import transaction
+from django.utils import timezone
+
+from courses.events import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Битовая карта активности пользователя: бит N — день ACTIVITY_EPOCH + N
+ACTIVITY_KEY = "courses:activity:{user_id}"
+ACTIVITY_EPOCH = date(2024, 1, 1)
+
+
+def get_day_offset(day):
+    return (day - ACTIVITY_EPOCH).days
+
+
+def record_activity(user_id, day=None):
+    """
+    Отмечает после коммита день (по умолчанию сегодня) активным:
+    завершён материал, урок или опрос. Один SETBIT, повтор за день ничего
+    не меняет.
+    """
+    offset = get_day_offset(day or timezone.localdate())
+
+    def set_bit():
+        try:
+            get_redis_client().setbit(ACTIVITY_KEY.format(user_id=user_id), offset, 1)
+        except redis.RedisError:
+            logger.warning("Failed to record learning activity", exc_info=True)
+
+    transaction.on_commit(set_bit)
+
+
+def calculate_streaks(bitmap, today):
+    """
+    Текущая и самая длинная серии подряд идущих активных дней по битовой
+    карте из Redis (бит со смещением N — старший бит байта N // 8).
+    Текущая серия не прерывается, пока сегодня ещё нет активности.
+    """
+    value = int.from_bytes(bitmap or b"", "big")
+
+    longest = 0
+    runs = value
+    while runs:
+        # после k шагов остаются только концы серий длиной больше k
+        runs &= runs << 1
+        longest += 1
+
+    # сдвигаем карту так, чтобы сегодняшний день стал младшим битом
+    today_position = len(bitmap or b"") * 8 - 1 - get_day_offset(today)
+    if today_position >= 0:
+        days = value >> today_position
+    else:
+        days = value << -today_position
+    if not days & 1:
+        days >>= 1
+    # число единиц в младших разрядах
+    current = ((days ^ (days + 1)) >> 1).bit_length()
+    return {"current_streak": current, "longest_streak": longest}
+
+
+def get_users_streaks(user_ids, today=None):
+    """
+    Серии активности пользователей одним конвейером GET:
+    {user_id: {"current_streak", "longest_streak"}}. Если Redis недоступен,
+    серии считаются нулевыми.
+    """
+    user_ids = list(user_ids)
+    today = today or timezone.localdate()
+    try:
+        with get_redis_client().pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.get(ACTIVITY_KEY.format(user_id=user_id))
+            bitmaps = pipe.execute()
+    except redis.RedisError:
+        logger.warning("Failed to read learning activity", exc_info=True)
+        bitmaps = [None] * len(user_ids)
+    return {
+        user_id: calculate_streaks(bitmap, today)
+        for user_id, bitmap in zip(user_ids, bitmaps, strict=True)
+    }
@@ -1,17 +1,197 @@
 from celery import shared_task
-from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 
-from courses.models import Achievement
+from courses.models import (METRIC_EVENTS, AchievementAwardJob,
+                            UserAchievement, UserCourse, UserCourseProgress,
+                            award_achievements, handle_achievements_awarded,
+                            insert_user_achievements)
+from courses.models.versions import bump_course_content_versions
+from courses.notifications import deliver_achievement_notifications
 
-User = get_user_model()
+PROGRESS_REFRESH_BATCH_SIZE = 1000
+ACHIEVEMENT_AWARD_BATCH_SIZE = 1000
+# Сколько пачек уведомлений обрабатывает один запуск периодической задачи
+ACHIEVEMENT_NOTIFICATION_MAX_BATCHES = 20
+
+# Проверки достижений пользователя, запрошенные в течение этого окна (сек.),
+# объединяются в одну задачу
+ACHIEVEMENT_CHECK_COUNTDOWN = 5
+ACHIEVEMENT_CHECK_TIMEOUT = ACHIEVEMENT_CHECK_COUNTDOWN + 60
+ACHIEVEMENT_CHECK_KEY = "courses:achievement-check:{user_id}"
+ACHIEVEMENT_CHECK_EVENT_KEY = "courses:achievement-check:{user_id}:{event}"
+ACHIEVEMENT_CHECK_STATS_KEY = "courses:achievement-check-stats:{name}"
+ACHIEVEMENT_CHECK_STATS = ["dispatched", "suppressed"]
+
+
+def dispatch_achievement_check(user_id, event):
+    """
+    Ставит проверку достижений пользователя с задержкой; пока она ждёт
+    выполнения, новые события только дописываются к ней, а не порождают
+    новые задачи. Счётчики поставленных и подавленных задач —
+    get_achievement_check_stats().
+    """
+    cache.set(
+        ACHIEVEMENT_CHECK_EVENT_KEY.format(user_id=user_id, event=event),
+        True,
+        ACHIEVEMENT_CHECK_TIMEOUT,
+    )
+    added = cache.add(
+        ACHIEVEMENT_CHECK_KEY.format(user_id=user_id), True, ACHIEVEMENT_CHECK_TIMEOUT
+    )
+    # None — кэш недоступен (IGNORE_EXCEPTIONS): задачу всё равно ставим
+    if added is False:
+        increment_achievement_check_stat("suppressed")
+        return
+    increment_achievement_check_stat("dispatched")
+    check_user_achievements_task.apply_async(
+        (user_id,), countdown=ACHIEVEMENT_CHECK_COUNTDOWN
+    )
+
+
+def increment_achievement_check_stat(name):
+    key = ACHIEVEMENT_CHECK_STATS_KEY.format(name=name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # ключ вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def get_achievement_check_stats():
+    return {
+        name: cache.get(ACHIEVEMENT_CHECK_STATS_KEY.format(name=name), 0)
+        for name in ACHIEVEMENT_CHECK_STATS
+    }
+
+
+def pop_pending_achievement_events(user_id):
+    """
+    Снимает отметку о поставленной проверке и забирает накопленные события.
+    Отметка снимается первой: событие, пришедшее позже, поставит новую задачу.
+    """
+    cache.delete(ACHIEVEMENT_CHECK_KEY.format(user_id=user_id))
+    keys = {
+        ACHIEVEMENT_CHECK_EVENT_KEY.format(user_id=user_id, event=event): event
+        for event in set().union(*METRIC_EVENTS.values())
+    }
+    pending = cache.get_many(keys)
+    cache.delete_many(pending)
+    return [keys[key] for key in pending]
+
+
+@shared_task
+def check_user_achievements_task(user_id, events=None):
+    """
+    Выдаёт пользователю все заработанные достижения: метрики и уже
+    выданные достижения читаются одним запросом каждые, новые
+    сохраняются одним bulk_create.
+
+    events (EVENT_* из achievements.checks) ограничивают проверку условиями,
+    которые эти события могут изменить. Без них берутся события, накопленные
+    dispatch_achievement_check, а если их нет — проверяется всё.
+    """
+    if events is None:
+        events = pop_pending_achievement_events(user_id) or None
+    award_achievements([user_id], events=events)
+
+
+@shared_task
+def refresh_course_progress_task(course_id, after=0):
+    """
+    Пересчитывает счётчики прогресса всех записавшихся на курс
+    после изменения его структуры. Один запуск обрабатывает одну пачку
+    пользовательских курсов с id больше after и ставит задачу для
+    следующей, чтобы каждый укладывался в лимит времени.
+    """
+    batch_ids = list(
+        UserCourse.objects.filter(course_id=course_id, pk__gt=after)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:PROGRESS_REFRESH_BATCH_SIZE]
+    )
+    if not batch_ids:
+        # Ответы с прогрессом могли закэшироваться до пересчёта
+        bump_course_content_versions([course_id])
+        return
+    UserCourseProgress.objects.refresh(
+        UserCourse.objects.filter(pk__in=batch_ids).only("pk", "course_id")
+    )
+    refresh_course_progress_task.delay(course_id, after=batch_ids[-1])
+
+
+def start_achievement_award_job(achievement):
+    """
+    Создаёт задание на выдачу достижения задним числом и запускает его
+    после коммита.
+    """
+    job = AchievementAwardJob.objects.create(achievement=achievement)
+    transaction.on_commit(lambda: award_achievement_retroactively_task.delay(job.pk))
+    return job
 
 
 @shared_task
-def check_user_achievements_task(user_id):
+def award_achievement_retroactively_task(job_id):
+    """
+    Выдаёт достижение всем, кто уже выполнил его условие. Один запуск
+    обрабатывает одну пачку получателей (сгруппированный запрос по условию
+    после last_user_id), сохраняет прогресс в AchievementAwardJob и ставит
+    задачу снова, пока получатели не кончатся: каждый запуск укладывается
+    в лимит времени, а перезапуск продолжает с last_user_id.
+    """
+    job = AchievementAwardJob.objects.select_related("achievement").get(pk=job_id)
+    if job.status == AchievementAwardJob.STATUS_COMPLETED:
+        return
+    if job.status != AchievementAwardJob.STATUS_RUNNING:
+        job.status = AchievementAwardJob.STATUS_RUNNING
+        job.save(update_fields=["status", "updated_at"])
+
     try:
-        user = User.objects.get(pk=user_id)
-    except User.DoesNotExist:
+        user_ids = list(
+            job.achievement.get_qualifying_user_ids(after=job.last_user_id)[
+                :ACHIEVEMENT_AWARD_BATCH_SIZE
+            ]
+        )
+        if user_ids:
+            # Уже выданные параллельной проверкой не считаются и не публикуются
+            awards = insert_user_achievements(
+                [
+                    UserAchievement(user_id=user_id, achievement=job.achievement)
+                    for user_id in user_ids
+                ]
+            )
+            handle_achievements_awarded(awards)
+
+            job.awarded_count += len(awards)
+            job.last_user_id = user_ids[-1]
+            job.save(update_fields=["awarded_count", "last_user_id", "updated_at"])
+    except Exception as exc:
+        job.status = AchievementAwardJob.STATUS_FAILED
+        job.error = str(exc)
+        job.save(update_fields=["status", "error", "updated_at"])
+        raise
+
+    if user_ids:
+        award_achievement_retroactively_task.delay(job_id)
         return
 
-    for achievement in Achievement.objects.filter(is_active=True):
-        achievement.check_for_user(user)
+    job.status = AchievementAwardJob.STATUS_COMPLETED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+
+
+@shared_task
+def deliver_achievement_notifications_task():
+    """
+    Периодическая задача: доставляет уведомления о достижениях пачками,
+    пока они есть, но не больше ACHIEVEMENT_NOTIFICATION_MAX_BATCHES за запуск.
+    Можно запускать в нескольких воркерах одновременно.
+    """
+    delivered = 0
+    for _ in range(ACHIEVEMENT_NOTIFICATION_MAX_BATCHES):
+        count = deliver_achievement_notifications()
+        if not count:
+            break
+        delivered += count
+    return delivered
@@ -0,0 +1,496 @@
+import json
+import warnings
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from courses.models import (Course, Lesson, UserAchievement, UserCourseLesson,
+                            UserCourseSurvey, award_achievements)
+from code_mentor_pro.users.tests.factories import UserFactory
+from courses.export import EXPORT_FIELDS
+from courses.tests.factories import (AnswerOptionFactory, CourseFactory,
+                                     QuestionFactory, SurveyFactory)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def api_client(user) -> APIClient:
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class TestUserProgressDetailView:
+    def test_get(self, api_client, user_course, django_assert_max_num_queries):
+        # savepoint, курсы пользователя для ETag (кэшируются), прогресс, release
+        with django_assert_max_num_queries(4):
+            response = api_client.get(reverse("api:user-progress"))
+
+        assert response.status_code == 200
+        assert response.data["progress"] == [
+            {
+                "course_id": user_course.course.id,
+                "title": user_course.course.title,
+                "slug": user_course.course.slug,
+                "progress": user_course.get_progress_details(),
+            }
+        ]
+
+
+    def test_get_not_modified(
+        self, api_client, user_course, django_assert_num_queries
+    ):
+        url = reverse("api:user-progress")
+        etag = api_client.get(url)["ETag"]
+
+        # Только SAVEPOINT/RELEASE от ATOMIC_REQUESTS, без чтения данных
+        with django_assert_num_queries(2) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert all("SAVEPOINT" in query["sql"] for query in queries.captured_queries)
+
+        assert response.status_code == 304
+
+    def test_get_modified_after_status_change(
+        self, api_client, user_course, django_capture_on_commit_callbacks
+    ):
+        url = reverse("api:user-progress")
+        etag = api_client.get(url)["ETag"]
+
+        user_course_survey = user_course.surveys.get(
+            status=UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED
+            user_course_survey.save()
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+    def test_get_modified_only_by_own_courses(
+        self, api_client, user_course, django_capture_on_commit_callbacks
+    ):
+        url = reverse("api:user-progress")
+        etag = api_client.get(url)["ETag"]
+
+        other_course = CourseFactory()
+        with django_capture_on_commit_callbacks(execute=True):
+            other_course.title = "Другой курс"
+            other_course.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user_course.course.title = "Новое название"
+            user_course.course.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+class TestUserAchievementsDetailView:
+    def test_get_not_modified(self, api_client, user, django_assert_num_queries):
+        url = reverse("api:user-achievements")
+        etag = api_client.get(url)["ETag"]
+
+        # Только SAVEPOINT/RELEASE от ATOMIC_REQUESTS, без чтения данных
+        with django_assert_num_queries(2) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert all("SAVEPOINT" in query["sql"] for query in queries.captured_queries)
+
+        assert response.status_code == 304
+
+    def test_get_modified_after_award(
+        self, api_client, user_course, django_capture_on_commit_callbacks
+    ):
+        UserAchievement.objects.all().delete()
+        url = reverse("api:user-achievements")
+        etag = api_client.get(url)["ETag"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            award_achievements([user_course.user_id])
+
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+    def test_get_awarded_from_cached_set(
+        self,
+        api_client,
+        user_course,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        UserAchievement.objects.all().delete()
+        url = reverse("api:user-achievements")
+        api_client.get(url)
+
+        # достижения; выданные берутся из кэша (+ SAVEPOINT/RELEASE)
+        with django_assert_num_queries(3):
+            response = api_client.get(url)
+        assert not any(item["awarded"] for item in response.data["achievements"])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            awarded = award_achievements([user_course.user_id])
+
+        response = api_client.get(url)
+        assert {
+            item["id"] for item in response.data["achievements"] if item["awarded"]
+        } == {award.achievement_id for award in awarded}
+
+
+class TestUserAchievementFeedView:
+    def test_get_delivered_only(self, api_client, user_course):
+        award_achievements([user_course.user_id])
+        _, *others = UserAchievement.objects.order_by("pk").values_list(
+            "pk", flat=True
+        )
+        UserAchievement.objects.filter(pk__in=others).update(is_notified=True)
+        url = reverse("api:user-achievement-feed")
+
+        response = api_client.get(url)
+        assert [item["id"] for item in response.data["notifications"]] == sorted(
+            others, reverse=True
+        )
+        assert all(
+            item["achievement"]["awarded"] for item in response.data["notifications"]
+        )
+
+        response = api_client.get(url, {"after": others[-1]})
+        assert response.data["notifications"] == []
+
+    def test_get_invalid_after(self, api_client):
+        response = api_client.get(reverse("api:user-achievement-feed"), {"after": "x"})
+        assert response.status_code == 400
+
+
+class TestCourseViewSet:
+    def test_list_authenticated(
+        self, api_client, user_course, django_assert_num_queries
+    ):
+        other_courses = CourseFactory.create_batch(2)
+        url = reverse("api:course-list")
+
+        # savepoint, страница курсов, фасеты, is_enrolled для неё, release
+        with django_assert_num_queries(5):
+            response = api_client.get(url, {"page_size": 2})
+
+        assert [
+            (course["id"], course["is_enrolled"])
+            for course in response.data["results"]
+        ] == [(user_course.course_id, True), (other_courses[0].pk, False)]
+
+        response = api_client.get(response.data["next"])
+        assert [course["id"] for course in response.data["results"]] == [
+            other_courses[1].pk
+        ]
+        assert response.data["next"] is None
+
+    def test_list_browsable_api_has_is_enrolled(self, api_client, user_course):
+        # не JSON — страница строится без кэша, сериализатором авторизованных
+        response = api_client.get(reverse("api:course-list"), HTTP_ACCEPT="text/html")
+
+        assert response.status_code == 200
+        assert response.data["results"][0]["is_enrolled"] is True
+
+    def test_list_anonymous(self, course):
+        CourseFactory(is_published=False)
+
+        response = APIClient().get(reverse("api:course-list"))
+
+        assert [item["id"] for item in response.json()["results"]] == [course.pk]
+        assert "is_enrolled" not in response.json()["results"][0]
+
+    def test_list_cached_until_course_changes(
+        self,
+        api_client,
+        user_course,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        url = reverse("api:course-list")
+        anonymous_client = APIClient()
+        anonymous_client.get(url)
+
+        with django_assert_num_queries(2):
+            response = anonymous_client.get(url)
+        assert response.json()["results"][0]["title"] == user_course.course.title
+
+        # savepoint, is_enrolled, release — страница из кэша
+        with django_assert_num_queries(3):
+            response = api_client.get(url)
+        assert response.data["results"][0]["is_enrolled"] is True
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user_course.course.title = "Новое название"
+            user_course.course.save()
+        response = anonymous_client.get(url)
+        assert response.json()["results"][0]["title"] == "Новое название"
+
+    def test_list_cache_ignores_unknown_params(
+        self, course, django_assert_num_queries
+    ):
+        CourseFactory()
+        url = reverse("api:course-list")
+        client = APIClient()
+        client.get(url, {"page_size": 1, "x": 1})
+
+        with django_assert_num_queries(2):
+            response = client.get(url, {"page_size": 1, "x": 2})
+
+        next_url = response.json()["next"]
+        assert "page_size=1" in next_url
+        assert "x=" not in next_url
+
+    def test_list_filters_with_facets(self, django_assert_num_queries):
+        matching = CourseFactory(
+            level=Course.LEVEL_BEGINNER,
+            certificate_available=True,
+            programming_language=Course.PROGRAMMING_LANGUAGE_PYTHON,
+        )
+        CourseFactory(level=Course.LEVEL_BEGINNER, certificate_available=False)
+        CourseFactory(level=Course.LEVEL_ADVANCED, certificate_available=True)
+        CourseFactory(level=Course.LEVEL_ADVANCED, is_published=False)
+
+        # savepoint, страница, все фасеты одним сгруппированным запросом, release
+        with django_assert_num_queries(4):
+            response = APIClient().get(
+                reverse("api:course-list"),
+                {"level": Course.LEVEL_BEGINNER, "certificate_available": "true"},
+            )
+
+        data = response.json()
+        assert [course["id"] for course in data["results"]] == [matching.pk]
+        # счётчики фасета учитывают только остальные выбранные фильтры
+        assert data["facets"]["level"] == [
+            {"value": Course.LEVEL_ADVANCED, "count": 1},
+            {"value": Course.LEVEL_BEGINNER, "count": 1},
+        ]
+        assert data["facets"]["certificate_available"] == [
+            {"value": False, "count": 1},
+            {"value": True, "count": 1},
+        ]
+        assert data["facets"]["programming_language"] == [
+            {"value": Course.PROGRAMMING_LANGUAGE_PYTHON, "count": 1}
+        ]
+
+    def test_list_unknown_filter_value(self, db):
+        response = APIClient().get(reverse("api:course-list"), {"level": "expert"})
+
+        assert response.status_code == 400
+        assert "level" in response.json()
+
+    def test_list_sparse_fieldset(
+        self, api_client, user_course, django_assert_num_queries
+    ):
+        url = reverse("api:course-list")
+
+        response = APIClient().get(url, {"fields": "id,title"})
+        assert response.json()["results"] == [
+            {"id": user_course.course_id, "title": user_course.course.title}
+        ]
+
+        # без is_enrolled нет и запроса на него
+        with django_assert_num_queries(4):
+            response = api_client.get(url, {"omit": "description,is_enrolled"})
+        assert "description" not in response.json()["results"][0]
+        assert "is_enrolled" not in response.json()["results"][0]
+
+        response = api_client.get(url, {"fields": "title,is_enrolled"})
+        assert response.data["results"] == [
+            {
+                "id": user_course.course_id,
+                "title": user_course.course.title,
+                "is_enrolled": True,
+            }
+        ]
+
+
+class TestCourseDetailView:
+    def test_get_enrolls_user(self, api_client, user, course):
+        response = api_client.get(reverse("api:course-detail", args=[course.slug]))
+
+        assert response.status_code == 200
+        lessons = [
+            lesson
+            for module in response.data["course"]["modules"]
+            for lesson in module["lessons"]
+        ]
+        assert len(lessons) == 4
+        assert {lesson["status"] for lesson in lessons} == {
+            UserCourseLesson.STATUS_NOT_VIEWED
+        }
+        assert UserCourseLesson.objects.filter(user_course__user=user).count() == 4
+        assert response.data["progress"]["total_lessons"] == 4
+
+    def test_get_marks_completed_lessons(self, api_client, user_course):
+        response = api_client.get(
+            reverse("api:course-detail", args=[user_course.course.slug])
+        )
+
+        lessons = [
+            lesson
+            for module in response.data["course"]["modules"]
+            for lesson in module["lessons"]
+        ]
+        assert [lesson["is_completed"] for lesson in lessons] == [
+            True,
+            False,
+            False,
+            False,
+        ]
+        assert response.data["progress"] == user_course.get_progress_details()
+
+    def test_get_anonymous(self, course):
+        response = APIClient().get(reverse("api:course-detail", args=[course.slug]))
+
+        assert response.status_code == 200
+        assert len(response.data["course"]["modules"]) == 2
+
+    def test_get_sparse_fieldset(self, api_client, course):
+        response = api_client.get(
+            reverse("api:course-detail", args=[course.slug]),
+            {"fields": "title,modules.lessons.id"},
+        )
+
+        assert list(response.data["course"]) == ["title", "modules"]
+        assert response.data["course"]["title"] == course.title
+        assert [
+            list(lesson)
+            for module in response.data["course"]["modules"]
+            for lesson in module["lessons"]
+        ] == [["id"]] * 4
+
+
+class TestLessonDetailView:
+    def test_get_skips_unrequested_surveys(self, api_client, course):
+        lesson = (
+            Lesson.objects.filter(module__course=course)
+            .annotate(surveys_count=Count("surveys"))
+            .get(surveys_count=2)
+        )
+        for survey in lesson.surveys.all():
+            QuestionFactory(survey=survey)
+        url = reverse("api:lesson-detail", args=[course.slug, lesson.pk])
+
+        response = api_client.get(url)
+        assert [
+            len(survey["questions"]) for survey in response.data["lesson"]["surveys"]
+        ] == [1, 1]
+
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url, {"fields": "id,surveys.title"})
+
+        assert response.data["lesson"] == {
+            "id": lesson.pk,
+            "surveys": [
+                {"title": survey.title} for survey in lesson.surveys.order_by("pk")
+            ],
+        }
+        assert not any(
+            "courses_question" in query["sql"] or "courses_material" in query["sql"]
+            for query in context.captured_queries
+        )
+
+
+class TestSaveSurveyAnswersView:
+    def test_post_completes_lesson(self, api_client, user, course):
+        lesson = (
+            Lesson.objects.filter(module__course=course)
+            .annotate(surveys_count=Count("surveys"))
+            .get(surveys_count=1)
+        )
+        survey = lesson.surveys.get()
+        question = QuestionFactory(survey=survey)
+        correct = AnswerOptionFactory(question=question, is_correct=True)
+        AnswerOptionFactory(question=question)
+
+        response = api_client.post(
+            reverse(
+                "api:save-survey-answers", args=[course.slug, lesson.pk, survey.pk]
+            ),
+            {"questions": [{"question_id": question.pk, "answers": [correct.pk]}]},
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert response.data["status"] == UserCourseSurvey.STATUS_COMPLETED
+        user_course_lesson = UserCourseLesson.objects.get(
+            user_course__user=user, lesson=lesson
+        )
+        assert user_course_lesson.status == UserCourseLesson.STATUS_COMPLETED
+
+        # повторная отправка не пересохраняет завершённый урок
+        api_client.post(
+            reverse(
+                "api:save-survey-answers", args=[course.slug, lesson.pk, survey.pk]
+            ),
+            {"questions": [{"question_id": question.pk, "answers": [correct.pk]}]},
+            format="json",
+        )
+        updated_at = user_course_lesson.updated_at
+        user_course_lesson.refresh_from_db()
+        assert user_course_lesson.updated_at == updated_at
+
+    def test_post_survey_from_other_lesson(self, api_client, course):
+        lesson = Lesson.objects.filter(module__course=course, surveys__isnull=True)[0]
+
+        response = api_client.post(
+            reverse(
+                "api:save-survey-answers",
+                args=[course.slug, lesson.pk, SurveyFactory().pk],
+            ),
+            {"questions": []},
+            format="json",
+        )
+
+        assert response.status_code == 404
+
+
+class TestCourseProgressExportView:
+    def test_get_csv(self, user_course):
+        client = APIClient()
+        client.force_authenticate(UserFactory(is_staff=True))
+
+        response = client.get(
+            reverse("api:course-progress-export", args=[user_course.course.slug]),
+            {"output": "csv"},
+        )
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "text/csv"
+        lines = response.getvalue().decode().splitlines()
+        assert lines[0] == ",".join(EXPORT_FIELDS)
+        assert len(lines) == 8
+
+    def test_get_under_asgi(self, user_course):
+        client = AsyncClient()
+        client.force_login(UserFactory(is_staff=True))
+
+        @async_to_sync
+        async def export():
+            response = await client.get(
+                reverse("api:course-progress-export", args=[user_course.course.slug])
+            )
+            assert isinstance(response, StreamingHttpResponse)
+            assert response.is_async
+            return b"".join([chunk async for chunk in response])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            lines = export().decode().splitlines()
+        assert len(lines) == 7
+        assert json.loads(lines[0])["user_id"] == user_course.user_id
+
+    def test_get_forbidden_for_learner(self, api_client, user_course):
+        response = api_client.get(
+            reverse("api:course-progress-export", args=[user_course.course.slug])
+        )
+
+        assert response.status_code == 403
@@ -0,0 +1,174 @@
+from fnmatch import fnmatch
+
+import pytest
+from django.core.cache import cache
+
+from code_mentor_pro.users.models import User
+from code_mentor_pro.users.tests.factories import UserFactory
+from courses.models import (Course, Lesson, UserCourse, UserCourseLesson,
+                            UserCourseSurvey)
+from courses.tests.factories import (CourseFactory, LessonFactory,
+                                     ModuleFactory, SurveyFactory,
+                                     UserCourseFactory)
+
+
+@pytest.fixture(autouse=True)
+def _celery_eager(settings) -> None:
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    yield
+    cache.clear()
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        return lambda *args, **kwargs: self.commands.append((method, args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """
+    Вместо Redis в тестах: запоминает опубликованные события и хранит
+    сортированные множества и битовые карты в памяти (только используемые
+    команды).
+    """
+
+    def __init__(self):
+        self.published = []
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch(key, match)]
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(
+            {str(member): float(score) for member, score in mapping.items()}
+        )
+
+    def zincrby(self, key, amount, member):
+        members = self.data.setdefault(key, {})
+        members[str(member)] = members.get(str(member), 0) + amount
+        return members[str(member)]
+
+    def _zrevsorted(self, key):
+        return sorted(
+            self.data.get(key, {}).items(), key=lambda item: (-item[1], item[0])
+        )
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        entries = [
+            (member.encode(), score)
+            for member, score in self._zrevsorted(key)[start : stop + 1]
+        ]
+        return entries if withscores else [member for member, _ in entries]
+
+    def zrevrank(self, key, member):
+        members = [member for member, _ in self._zrevsorted(key)]
+        return members.index(str(member)) if str(member) in members else None
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(str(member))
+
+    def setbit(self, key, offset, value):
+        bitmap = self.data.setdefault(key, bytearray())
+        byte_index, bit = divmod(offset, 8)
+        bitmap.extend(bytes(max(byte_index + 1 - len(bitmap), 0)))
+        mask = 0x80 >> bit
+        previous = int(bool(bitmap[byte_index] & mask))
+        if value:
+            bitmap[byte_index] |= mask
+        else:
+            bitmap[byte_index] &= ~mask
+        return previous
+
+    def get(self, key):
+        value = self.data.get(key)
+        return bytes(value) if value is not None else None
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch) -> FakeRedis:
+    client = FakeRedis()
+    monkeypatch.setattr("courses.events.get_redis_connection", lambda alias: client)
+    return client
+
+
+@pytest.fixture
+def user(db) -> User:
+    return UserFactory()
+
+
+@pytest.fixture
+def course(db) -> Course:
+    """
+    Модуль 1: урок без опросов, урок с двумя опросами, урок с общим опросом.
+    Модуль 2: урок без опросов.
+    """
+    course = CourseFactory()
+    first_module = ModuleFactory(course=course)
+    second_module = ModuleFactory(course=course)
+
+    survey = SurveyFactory()
+    shared_survey = SurveyFactory()
+    LessonFactory(module=first_module)
+    LessonFactory(module=first_module).surveys.set([survey, shared_survey])
+    LessonFactory(module=first_module).surveys.set([shared_survey])
+    LessonFactory(module=second_module)
+    return course
+
+
+@pytest.fixture
+def user_course(user, course) -> UserCourse:
+    """
+    Завершены урок без опросов и один опрос, общий опрос пройден с ошибками.
+    """
+    user_course = UserCourseFactory(user=user, course=course)
+    lesson_without_surveys, lesson_with_surveys = Lesson.objects.filter(
+        module__course=course
+    ).order_by("module__order", "order")[:2]
+    survey, shared_survey = lesson_with_surveys.surveys.order_by("pk")
+
+    UserCourseLesson.objects.create(
+        user_course=user_course,
+        lesson=lesson_without_surveys,
+        status=UserCourseLesson.STATUS_COMPLETED,
+    )
+    UserCourseSurvey.objects.create(
+        user_course=user_course,
+        survey=survey,
+        status=UserCourseSurvey.STATUS_COMPLETED,
+    )
+    UserCourseSurvey.objects.create(
+        user_course=user_course,
+        survey=shared_survey,
+        status=UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS,
+    )
+    return user_course
@@ -0,0 +1,75 @@
+from factory import Faker, Sequence, SubFactory
+from factory.django import DjangoModelFactory
+
+from code_mentor_pro.users.tests.factories import UserFactory
+from courses.models import (AnswerOption, Course, Lesson, Material, Module,
+                            Question, Survey, UserCourse)
+
+
+class CourseFactory(DjangoModelFactory[Course]):
+    title = Sequence(lambda n: f"Course {n}")
+    description = Faker("text")
+    logo = "courses/logos/logo.png"
+    is_published = True
+
+    class Meta:
+        model = Course
+
+
+class ModuleFactory(DjangoModelFactory[Module]):
+    course = SubFactory(CourseFactory)
+    title = Faker("sentence")
+    order = Sequence(lambda n: n)
+
+    class Meta:
+        model = Module
+
+
+class LessonFactory(DjangoModelFactory[Lesson]):
+    module = SubFactory(ModuleFactory)
+    title = Faker("sentence")
+    order = Sequence(lambda n: n)
+
+    class Meta:
+        model = Lesson
+
+
+class MaterialFactory(DjangoModelFactory[Material]):
+    lesson = SubFactory(LessonFactory)
+    title = Faker("sentence")
+    language = Material.LANGUAGE_RU
+    material_type = Material.MATERIAL_TYPE_TEXT
+
+    class Meta:
+        model = Material
+
+
+class SurveyFactory(DjangoModelFactory[Survey]):
+    title = Faker("sentence")
+
+    class Meta:
+        model = Survey
+
+
+class QuestionFactory(DjangoModelFactory[Question]):
+    survey = SubFactory(SurveyFactory)
+    text = Faker("sentence")
+
+    class Meta:
+        model = Question
+
+
+class AnswerOptionFactory(DjangoModelFactory[AnswerOption]):
+    question = SubFactory(QuestionFactory)
+    text = Faker("word")
+
+    class Meta:
+        model = AnswerOption
+
+
+class UserCourseFactory(DjangoModelFactory[UserCourse]):
+    user = SubFactory(UserFactory)
+    course = SubFactory(CourseFactory)
+
+    class Meta:
+        model = UserCourse
@@ -0,0 +1,264 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.core.cache import cache
+
+from courses.models import (EVENT_LESSON_COMPLETED, EVENT_SURVEY_COMPLETED,
+                            METRIC_COMPLETED_LESSONS, Achievement,
+                            AchievementAwardJob, UserAchievement,
+                            UserCourseLesson, UserCourseSurvey,
+                            award_achievements, get_achievement_rules,
+                            insert_user_achievements)
+from courses.models.achievements import ACHIEVEMENT_RULES_KEY
+from courses.tasks import (award_achievement_retroactively_task,
+                           check_user_achievements_task,
+                           dispatch_achievement_check,
+                           get_achievement_check_stats,
+                           pop_pending_achievement_events)
+from courses.tests.factories import UserCourseFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_seeded_achievements_have_rules():
+    assert not Achievement.objects.filter(metric="").exists()
+    assert set(Achievement.objects.values_list("code", flat=True)) == set(
+        Achievement.AchievementCode
+    )
+
+
+@pytest.mark.parametrize(
+    "migration", ["0018_achievement_metric_threshold", "0020_achievement_streak_codes"]
+)
+def test_rule_migrations_forget_cached_rules(migration):
+    get_achievement_rules()
+    assert cache.get(ACHIEVEMENT_RULES_KEY) is not None
+
+    import_module(f"courses.migrations.{migration}").forget_achievement_rules(
+        apps, None
+    )
+
+    assert cache.get(ACHIEVEMENT_RULES_KEY) is None
+
+
+def test_check_user_achievements_task(user_course, django_assert_num_queries):
+    UserAchievement.objects.all().delete()
+
+    # условия достижений, метрики, уже выданные и одна вставка
+    with django_assert_num_queries(4):
+        check_user_achievements_task(user_course.user_id)
+
+    assert set(
+        UserAchievement.objects.filter(user=user_course.user).values_list(
+            "achievement__code", flat=True
+        )
+    ) == {
+        Achievement.AchievementCode.ENROLL_FIRST_COURSE,
+        Achievement.AchievementCode.COMPLETE_FIRST_SURVEY,
+        Achievement.AchievementCode.COMPLETE_FIRST_LESSON,
+    }
+
+
+def test_check_user_achievements_task_nothing_new(
+    user_course, django_assert_num_queries
+):
+    check_user_achievements_task(user_course.user_id)
+
+    # условия достижений уже в кэше
+    with django_assert_num_queries(2):
+        check_user_achievements_task(user_course.user_id)
+
+
+def test_new_threshold_achievement_costs_no_queries(
+    user_course, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    award_achievements([user_course.user_id])
+    with django_capture_on_commit_callbacks(execute=True):
+        fifty_lessons = Achievement.objects.create(
+            title="Пройти 50 уроков", metric=METRIC_COMPLETED_LESSONS, threshold=50
+        )
+        first_lesson = Achievement.objects.create(
+            title="Первый урок", metric=METRIC_COMPLETED_LESSONS, threshold=1
+        )
+    award_achievements([user_course.user_id])  # прогреть условия
+
+    assert UserAchievement.objects.filter(achievement=first_lesson).exists()
+    assert not UserAchievement.objects.filter(achievement=fifty_lessons).exists()
+    with django_assert_num_queries(2):
+        assert award_achievements([user_course.user_id]) == []
+
+
+def test_award_achievements_for_event(user_course, django_assert_num_queries):
+    UserAchievement.objects.all().delete()
+
+    with django_assert_num_queries(4) as queries:
+        awarded = award_achievements(
+            [user_course.user_id], events=[EVENT_SURVEY_COMPLETED]
+        )
+
+    assert [award.achievement.code for award in awarded] == [
+        Achievement.AchievementCode.COMPLETE_FIRST_SURVEY
+    ]
+    # считается только метрика опросов
+    metrics_sql = queries.captured_queries[1]["sql"]
+    assert "courses_usercoursesurvey" in metrics_sql
+    assert "courses_usercourselesson" not in metrics_sql
+
+
+def test_insert_user_achievements_skips_existing(user):
+    first, second = Achievement.objects.order_by("pk")[:2]
+    existing = UserAchievement.objects.create(user=user, achievement=first)
+
+    inserted = insert_user_achievements(
+        [
+            UserAchievement(user=user, achievement=first),
+            UserAchievement(user=user, achievement=second),
+        ]
+    )
+
+    assert [(award.pk, award.achievement_id) for award in inserted] == [
+        (UserAchievement.objects.get(user=user, achievement=second).pk, second.pk)
+    ]
+    assert UserAchievement.objects.get(pk=existing.pk).awarded_at == existing.awarded_at
+
+
+def test_dispatch_achievement_check_coalesces(user, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(
+        check_user_achievements_task,
+        "apply_async",
+        lambda args, **kwargs: enqueued.append(args),
+    )
+
+    for event in [EVENT_SURVEY_COMPLETED] * 3 + [EVENT_LESSON_COMPLETED]:
+        dispatch_achievement_check(user.pk, event)
+
+    assert enqueued == [(user.pk,)]
+    assert get_achievement_check_stats() == {"dispatched": 1, "suppressed": 3}
+    assert set(pop_pending_achievement_events(user.pk)) == {
+        EVENT_SURVEY_COMPLETED,
+        EVENT_LESSON_COMPLETED,
+    }
+
+    # после старта задачи следующее событие ставит новую
+    dispatch_achievement_check(user.pk, EVENT_LESSON_COMPLETED)
+    assert enqueued == [(user.pk,), (user.pk,)]
+
+
+class TestStatusTransitions:
+    def test_completed_dispatches_once_on_commit(
+        self, user_course, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        dispatched = []
+        monkeypatch.setattr(
+            "courses.models.signals.dispatch_achievement_check",
+            lambda user_id, event: dispatched.append(event),
+        )
+        user_course_survey = user_course.surveys.get(
+            status=UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+        )
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED
+            user_course_survey.save()
+            user_course_survey.save()
+        assert dispatched == []
+
+        for callback in callbacks:
+            callback()
+        assert dispatched == [EVENT_SURVEY_COMPLETED]
+
+    def test_status_transition(self, user_course):
+        user_course_survey = user_course.surveys.get(
+            status=UserCourseSurvey.STATUS_COMPLETED
+        )
+
+        user_course_survey.save()
+        assert user_course_survey.status_transition is None
+
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+        user_course_survey.save()
+        assert user_course_survey.status_transition == (
+            UserCourseSurvey.STATUS_COMPLETED,
+            UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS,
+        )
+        assert not user_course_survey.has_transitioned_to(
+            UserCourseSurvey.STATUS_COMPLETED
+        )
+
+
+class TestRetroactiveAward:
+    def test_activation_awards_qualifying_users(
+        self, user_course, django_capture_on_commit_callbacks
+    ):
+        achievement = Achievement.objects.get(
+            code=Achievement.AchievementCode.COMPLETE_FIRST_SURVEY
+        )
+        achievement.is_active = False
+        achievement.save()
+        UserAchievement.objects.all().delete()
+        UserCourseFactory(course=user_course.course)  # без пройденных опросов
+
+        with django_capture_on_commit_callbacks(execute=True):
+            achievement.is_active = True
+            achievement.save()
+
+        job = achievement.award_jobs.get()
+        assert job.status == AchievementAwardJob.STATUS_COMPLETED
+        assert job.awarded_count == 1
+        assert list(
+            UserAchievement.objects.values_list("user_id", "achievement_id")
+        ) == [(user_course.user_id, achievement.pk)]
+
+    def test_job_awards_one_batch_per_run(self, user_course, monkeypatch):
+        monkeypatch.setattr("courses.tasks.ACHIEVEMENT_AWARD_BATCH_SIZE", 1)
+        UserAchievement.objects.all().delete()
+        other = UserCourseFactory(course=user_course.course)
+        UserCourseLesson.objects.create(
+            user_course=other,
+            lesson=user_course.lessons.get().lesson,
+            status=UserCourseLesson.STATUS_COMPLETED,
+        )
+        achievement = Achievement.objects.get(
+            code=Achievement.AchievementCode.COMPLETE_FIRST_LESSON
+        )
+        job = AchievementAwardJob.objects.create(achievement=achievement)
+        runs = []
+        delay = award_achievement_retroactively_task.delay
+
+        def delay_next_run(job_id):
+            runs.append(job_id)
+            return delay(job_id)
+
+        monkeypatch.setattr(
+            award_achievement_retroactively_task, "delay", delay_next_run
+        )
+
+        award_achievement_retroactively_task(job.pk)
+
+        job.refresh_from_db()
+        assert runs == [job.pk, job.pk]
+        assert job.status == AchievementAwardJob.STATUS_COMPLETED
+        assert job.awarded_count == 2
+        assert job.last_user_id == other.user_id
+
+    def test_resave_does_not_start_job(self, user_course):
+        achievement = Achievement.objects.get(
+            code=Achievement.AchievementCode.COMPLETE_FIRST_SURVEY
+        )
+        achievement.title = "Новое название"
+        achievement.save()
+
+        assert not achievement.award_jobs.exists()
+
+    def test_qualifying_users_query(self, user_course, django_assert_num_queries):
+        UserAchievement.objects.all().delete()
+        achievement = Achievement.objects.get(
+            code=Achievement.AchievementCode.COMPLETE_FIRST_LESSON
+        )
+
+        with django_assert_num_queries(1):
+            assert list(achievement.get_qualifying_user_ids()) == [
+                user_course.user_id
+            ]
@@ -0,0 +1,78 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from courses.models import (Achievement, UserAchievement, UserCourseProgress,
+                            award_achievements)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def achievements(user_course):
+    # Как будто достижения появились уже после прогресса пользователя
+    UserAchievement.objects.all().delete()
+    return list(Achievement.objects.filter(is_active=True))
+
+
+def test_award_achievements(user, achievements):
+    awarded = award_achievements([user.pk])
+
+    assert {award.achievement.code for award in awarded} == {
+        Achievement.AchievementCode.ENROLL_FIRST_COURSE,
+        Achievement.AchievementCode.COMPLETE_FIRST_SURVEY,
+        Achievement.AchievementCode.COMPLETE_FIRST_LESSON,
+    }
+    assert UserAchievement.objects.filter(user=user).count() == 3
+    assert award_achievements([user.pk]) == []
+
+
+def test_award_achievements_matches_checks(user, achievements):
+    awarded = {award.achievement_id for award in award_achievements([user.pk])}
+    UserAchievement.objects.all().delete()
+
+    for achievement in achievements:
+        assert (achievement.pk in awarded) == achievement.check_for_user(user)
+
+
+def test_backfill_dry_run(user_course, achievements):
+    UserCourseProgress.objects.all().delete()
+
+    out = StringIO()
+    call_command("backfill_learning_state", "--dry-run", stdout=out)
+
+    assert "прогресса: 1, новых достижений: 3" in out.getvalue()
+    assert not UserCourseProgress.objects.exists()
+    assert not UserAchievement.objects.exists()
+
+
+def test_backfill_writes_checkpoint(user_course, achievements, tmp_path):
+    UserCourseProgress.objects.all().delete()
+    checkpoint = tmp_path / "checkpoint.json"
+
+    call_command(
+        "backfill_learning_state", "--checkpoint", str(checkpoint), stdout=StringIO()
+    )
+
+    assert user_course.progress.get_progress_details()["progress_percent"] == 29
+    assert UserAchievement.objects.filter(user=user_course.user).count() == 3
+    assert json.loads(checkpoint.read_text()) == {"last_id": user_course.pk}
+
+    out = StringIO()
+    call_command(
+        "backfill_learning_state", "--checkpoint", str(checkpoint), stdout=out
+    )
+    assert "Обработано записей: 0" in out.getvalue()
+
+
+def test_backfill_counts_changed_progress_only(user_course, achievements):
+    UserCourseProgress.objects.all().delete()
+    out = StringIO()
+    call_command("backfill_learning_state", stdout=out)
+    assert "Обновлено записей прогресса: 1" in out.getvalue()
+
+    out = StringIO()
+    call_command("backfill_learning_state", stdout=out)
+    assert "Обновлено записей прогресса: 0" in out.getvalue()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient, force_authenticate
+
+from courses.api.views import UserLearningEventsView
+from courses.events import (EVENT_ACHIEVEMENT_AWARDED, EVENT_PROGRESS_CHANGED,
+                            LEARNING_EVENTS_CHANNEL, format_event,
+                            stream_learning_events)
+from courses.models import UserAchievement, UserCourseSurvey, award_achievements
+
+pytestmark = pytest.mark.django_db
+
+
+def parse_events(redis_client):
+    events = []
+    for channel, frame in redis_client.published:
+        event_line, data_line, *_ = frame.split("\n")
+        events.append(
+            (
+                channel,
+                event_line.removeprefix("event: "),
+                json.loads(data_line.removeprefix("data: ")),
+            )
+        )
+    return events
+
+
+def test_progress_change_published_on_commit(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    user_course_survey = user_course.surveys.get(
+        status=UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED
+        user_course_survey.save()
+        assert redis_client.published == []
+
+    ((channel, event, data),) = [
+        item
+        for item in parse_events(redis_client)
+        if item[1] == EVENT_PROGRESS_CHANGED
+    ]
+    assert channel == LEARNING_EVENTS_CHANNEL.format(user_id=user_course.user_id)
+    assert data["course_id"] == user_course.course_id
+    assert data["completed_surveys"] == 3
+
+
+def test_awarded_achievements_published(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    UserAchievement.objects.all().delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        awarded = award_achievements([user_course.user_id])
+
+    assert parse_events(redis_client) == [
+        (
+            LEARNING_EVENTS_CHANNEL.format(user_id=user_course.user_id),
+            EVENT_ACHIEVEMENT_AWARDED,
+            {"id": award.achievement_id},
+        )
+        for award in awarded
+    ]
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.channels = []
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def get_message(self, **kwargs):
+        return self.messages.pop(0) if self.messages else None
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeAsyncRedis:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def pubsub(self):
+        return self._pubsub
+
+    async def aclose(self):
+        pass
+
+
+def test_stream_learning_events(monkeypatch):
+    frame = format_event(EVENT_ACHIEVEMENT_AWARDED, {"id": 1})
+    pubsub = FakePubSub([{"data": frame.encode()}])
+    monkeypatch.setattr(
+        "redis.asyncio.Redis.from_url", lambda url: FakeAsyncRedis(pubsub)
+    )
+
+    async def read(count):
+        stream = stream_learning_events(7)
+        frames = [await anext(stream) for _ in range(count)]
+        await stream.aclose()
+        return frames
+
+    assert asyncio.run(read(3)) == [
+        "retry: 5000\n\n",
+        frame.encode(),
+        ": keepalive\n\n",
+    ]
+    assert pubsub.channels == [LEARNING_EVENTS_CHANNEL.format(user_id=7)]
+    assert pubsub.closed
+
+
+def test_user_events_view(user):
+    request = AsyncRequestFactory().get(
+        reverse("api:user-events"), HTTP_ACCEPT="text/event-stream"
+    )
+    force_authenticate(request, user)
+
+    response = UserLearningEventsView.as_view()(request)
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "text/event-stream"
+    assert response["Cache-Control"] == "no-cache"
+    response.close()
+
+
+def test_user_events_view_under_wsgi(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse("api:user-events"), HTTP_ACCEPT="text/event-stream")
+
+    assert response.status_code == 501
+    assert not response.streaming
+    assert response.content.startswith(b"event: error\n")
+
+
+def test_user_events_view_anonymous(db):
+    response = APIClient().get(
+        reverse("api:user-events"), HTTP_ACCEPT="text/event-stream"
+    )
+
+    assert response.status_code == 403
@@ -0,0 +1,61 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from courses.export import iter_course_progress_rows
+from courses.models import UserCourseLesson, UserCourseSurvey
+from courses.tests.factories import UserCourseFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_iter_course_progress_rows(user_course):
+    other = UserCourseFactory(course=user_course.course)
+
+    rows = list(iter_course_progress_rows(user_course.course, chunk_size=1))
+
+    # 4 урока и 3 пары (урок, опрос) на каждого ученика
+    assert [row["user_id"] for row in rows] == [user_course.user_id] * 7 + [
+        other.user_id
+    ] * 7
+    assert [row["status"] for row in rows[:7]] == [
+        UserCourseLesson.STATUS_COMPLETED,
+        UserCourseLesson.STATUS_NOT_VIEWED,
+        UserCourseSurvey.STATUS_COMPLETED,
+        UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS,
+        UserCourseLesson.STATUS_NOT_VIEWED,
+        UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS,
+        UserCourseLesson.STATUS_NOT_VIEWED,
+    ]
+    assert {row["status"] for row in rows[7:]} == {
+        UserCourseLesson.STATUS_NOT_VIEWED,
+        UserCourseSurvey.STATUS_NOT_COMPLETED_YET,
+    }
+
+
+def test_export_command_csv(user_course):
+    out = StringIO()
+    call_command(
+        "export_course_progress",
+        user_course.course.slug,
+        "--output-format",
+        "csv",
+        stdout=out,
+    )
+
+    rows = list(csv.DictReader(StringIO(out.getvalue())))
+    assert len(rows) == 7
+    assert rows[0]["email"] == user_course.user.email
+    assert rows[0]["status"] == UserCourseLesson.STATUS_COMPLETED
+
+
+def test_export_command_ndjson_file(user_course, tmp_path):
+    path = tmp_path / "progress.ndjson"
+    call_command("export_course_progress", user_course.course.slug, "--output", path)
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(rows) == 7
+    assert rows[2]["survey_id"] is not None
@@ -0,0 +1,190 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from code_mentor_pro.users.tests.factories import UserFactory
+from courses.leaderboards import (LEADERBOARD_ACHIEVEMENTS, get_around,
+                                  get_leaderboard_key)
+from courses.models import (METRIC_COMPLETED_LESSONS, METRIC_COMPLETED_SURVEYS,
+                            UserAchievement, UserCourseSurvey,
+                            award_achievements)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_survey_transitions_update_leaderboards(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    user_course_survey = user_course.surveys.get(
+        status=UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+    )
+    keys = [
+        get_leaderboard_key(METRIC_COMPLETED_SURVEYS),
+        get_leaderboard_key(METRIC_COMPLETED_SURVEYS, user_course.course_id),
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED
+        user_course_survey.save()
+    assert [redis_client.zscore(key, user_course.user_id) for key in keys] == [1, 1]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+        user_course_survey.save()
+    assert [redis_client.zscore(key, user_course.user_id) for key in keys] == [0, 0]
+
+
+def test_awarded_achievements_update_leaderboard(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    UserAchievement.objects.all().delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        award_achievements([user_course.user_id])
+
+    assert (
+        redis_client.zscore(
+            get_leaderboard_key(LEADERBOARD_ACHIEVEMENTS), user_course.user_id
+        )
+        == 3
+    )
+
+
+def test_deletions_update_leaderboards(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        award_achievements([user_course.user_id])
+    survey_key = get_leaderboard_key(
+        METRIC_COMPLETED_SURVEYS, user_course.course_id
+    )
+    redis_client.zadd(survey_key, {user_course.user_id: 1})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        UserAchievement.objects.filter(user=user_course.user).delete()
+        # незавершённые опросы рейтинг не меняют
+        user_course.surveys.all().delete()
+
+    assert (
+        redis_client.zscore(
+            get_leaderboard_key(LEADERBOARD_ACHIEVEMENTS), user_course.user_id
+        )
+        == 0
+    )
+    assert redis_client.zscore(survey_key, user_course.user_id) == 0
+
+
+def test_cascade_delete_reads_user_courses_once(
+    user_course, redis_client, django_capture_on_commit_callbacks
+):
+    lesson_key = get_leaderboard_key(METRIC_COMPLETED_LESSONS)
+    survey_key = get_leaderboard_key(METRIC_COMPLETED_SURVEYS)
+    redis_client.zadd(lesson_key, {user_course.user_id: 1})
+    redis_client.zadd(survey_key, {user_course.user_id: 1})
+
+    with (
+        django_capture_on_commit_callbacks(execute=True),
+        CaptureQueriesContext(connection) as queries,
+    ):
+        user_course.delete()
+
+    user_course_reads = [
+        query["sql"]
+        for query in queries.captured_queries
+        if query["sql"].startswith('SELECT "courses_usercourse"."id"')
+    ]
+    assert len(user_course_reads) == 1
+    assert redis_client.zscore(lesson_key, user_course.user_id) == 0
+    assert redis_client.zscore(survey_key, user_course.user_id) == 0
+
+
+def test_rebuild_leaderboards(user_course, redis_client):
+    award_achievements([user_course.user_id])
+    stale_key = get_leaderboard_key(METRIC_COMPLETED_LESSONS, 0)
+    redis_client.zadd(stale_key, {user_course.user_id: 5})
+
+    out = StringIO()
+    call_command("rebuild_leaderboards", stdout=out)
+
+    user_id = user_course.user_id
+    course_id = user_course.course_id
+    assert redis_client.zscore(get_leaderboard_key("achievements"), user_id) == 3
+    assert redis_client.zscore(get_leaderboard_key("completed_surveys"), user_id) == 1
+    course_key = get_leaderboard_key("completed_lessons", course_id)
+    assert redis_client.zscore(course_key, user_id) == 1
+    assert redis_client.zscore(stale_key, user_id) is None
+    assert "Пересобрано рейтингов: 5" in out.getvalue()
+
+
+class TestLeaderboardViews:
+    @pytest.fixture
+    def ranked_users(self, redis_client):
+        users = UserFactory.create_batch(5)
+        redis_client.zadd(
+            get_leaderboard_key(LEADERBOARD_ACHIEVEMENTS),
+            {user.pk: score for score, user in enumerate(users, start=1)},
+        )
+        return users
+
+    @pytest.fixture
+    def api_client(self, ranked_users):
+        client = APIClient()
+        client.force_authenticate(ranked_users[1])
+        return client
+
+    def test_top(self, api_client, ranked_users, django_assert_num_queries):
+        url = reverse("api:leaderboard-top", args=[LEADERBOARD_ACHIEVEMENTS])
+
+        # savepoint, имена пользователей, release
+        with django_assert_num_queries(3):
+            response = api_client.get(url, {"limit": 2})
+
+        assert response.data["results"] == [
+            {
+                "rank": 1,
+                "user": {"id": ranked_users[4].pk, "name": ranked_users[4].name},
+                "score": 5,
+            },
+            {
+                "rank": 2,
+                "user": {"id": ranked_users[3].pk, "name": ranked_users[3].name},
+                "score": 4,
+            },
+        ]
+
+    def test_around_me(self, api_client, ranked_users):
+        url = reverse("api:leaderboard-around-me", args=[LEADERBOARD_ACHIEVEMENTS])
+
+        response = api_client.get(url, {"radius": 1})
+
+        assert [row["rank"] for row in response.data["results"]] == [3, 4, 5]
+        assert response.data["results"][1]["user"]["id"] == ranked_users[1].pk
+
+    def test_around_me_not_ranked(self, user):
+        assert get_around(LEADERBOARD_ACHIEVEMENTS, user.pk) == []
+
+    def test_course_leaderboard(self, api_client, user_course, redis_client):
+        redis_client.zadd(
+            get_leaderboard_key(METRIC_COMPLETED_LESSONS, user_course.course_id),
+            {user_course.user_id: 1},
+        )
+        url = reverse("api:leaderboard-top", args=[METRIC_COMPLETED_LESSONS])
+
+        response = api_client.get(url, {"course": user_course.course.slug})
+
+        assert [row["user"]["id"] for row in response.data["results"]] == [
+            user_course.user_id
+        ]
+
+    def test_invalid_requests(self, api_client, course):
+        top_url = reverse("api:leaderboard-top", args=[LEADERBOARD_ACHIEVEMENTS])
+
+        assert api_client.get(top_url, {"course": course.slug}).status_code == 400
+        assert api_client.get(top_url, {"limit": 0}).status_code == 400
+        unknown_url = reverse("api:leaderboard-top", args=["unknown"])
+        assert api_client.get(unknown_url).status_code == 404
@@ -0,0 +1,69 @@
+import pytest
+from django.core import mail
+
+from courses.models import UserAchievement, award_achievements
+from courses.notifications import (deliver_achievement_notifications,
+                                   send_achievement_emails)
+from courses.tasks import deliver_achievement_notifications_task
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def awards(user_course):
+    UserAchievement.objects.all().delete()
+    return award_achievements([user_course.user_id])
+
+
+def test_deliver_achievement_notifications(
+    user, awards, django_assert_num_queries
+):
+    # savepoint, захват пачки, один UPDATE, release
+    with django_assert_num_queries(4) as queries:
+        assert deliver_achievement_notifications(batch_size=2) == 2
+
+    claim_sql = queries.captured_queries[1]["sql"]
+    assert "FOR UPDATE OF" in claim_sql
+    assert "SKIP LOCKED" in claim_sql
+    assert [message.to for message in mail.outbox] == [[user.email]] * 2
+    assert UserAchievement.objects.filter(is_notified=False).count() == 1
+
+
+def test_deliver_achievement_notifications_task(awards):
+    assert deliver_achievement_notifications_task() == 3
+    assert deliver_achievement_notifications_task() == 0
+
+    assert len(mail.outbox) == 3
+    assert not UserAchievement.objects.filter(is_notified=False).exists()
+
+
+def test_failed_delivery_is_recorded_per_award(awards, monkeypatch):
+    failed = awards[0]
+    monkeypatch.setattr(
+        "courses.notifications.ACHIEVEMENT_NOTIFIERS",
+        [send_achievement_emails, lambda batch: {failed.pk: "push недоступен"}],
+    )
+
+    assert deliver_achievement_notifications() == 2
+
+    assert dict(
+        UserAchievement.objects.exclude(notification_error="").values_list(
+            "pk", "notification_error"
+        )
+    ) == {failed.pk: "push недоступен"}
+    assert not UserAchievement.objects.filter(is_notified=False).exists()
+
+
+def test_notifier_crash_does_not_resend_batch(awards, monkeypatch):
+    def crash(batch):
+        raise ConnectionError
+
+    monkeypatch.setattr(
+        "courses.notifications.ACHIEVEMENT_NOTIFIERS", [send_achievement_emails, crash]
+    )
+
+    with pytest.raises(ConnectionError):
+        deliver_achievement_notifications()
+    assert deliver_achievement_notifications() == 0
+
+    assert len(mail.outbox) == 3
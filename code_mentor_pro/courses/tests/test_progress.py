@@ -0,0 +1,226 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from courses.models import UserCourse, UserCourseProgress, UserCourseSurvey
+from courses.models.progress import bitmap_positions, make_bitmap
+from courses.models.structure import get_course_structure
+from courses.tasks import refresh_course_progress_task
+from courses.tests.factories import (LessonFactory, SurveyFactory,
+                                     UserCourseFactory)
+
+pytestmark = pytest.mark.django_db
+
+
+def module_details(module, *counters):
+    fields = [
+        "total_lessons",
+        "completed_lessons",
+        "total_surveys",
+        "completed_surveys",
+        "progress_percent",
+    ]
+    return {"module_id": module.pk, **dict(zip(fields, counters, strict=True))}
+
+
+def test_get_progress_details(user_course):
+    first_module, second_module = user_course.course.modules.order_by("order", "pk")
+
+    assert user_course.get_progress_details() == {
+        "total_lessons": 4,
+        "completed_lessons": 1,
+        "total_surveys": 3,
+        "completed_surveys": 1,
+        "progress_percent": 29,
+        "modules": [
+            module_details(first_module, 3, 1, 3, 1, 33),
+            module_details(second_module, 1, 0, 0, 0, 0),
+        ],
+    }
+
+
+def test_get_progress_details_counts_shared_survey_per_lesson(user_course):
+    for user_course_survey in user_course.surveys.all():
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED
+        user_course_survey.save()
+    first_module, second_module = user_course.course.modules.order_by("order", "pk")
+
+    assert user_course.get_progress_details() == {
+        "total_lessons": 4,
+        "completed_lessons": 3,
+        "total_surveys": 3,
+        "completed_surveys": 3,
+        "progress_percent": 86,
+        "modules": [
+            module_details(first_module, 3, 3, 3, 3, 100),
+            module_details(second_module, 1, 0, 0, 0, 0),
+        ],
+    }
+
+
+def test_get_progress_details_empty_course(user):
+    assert UserCourseFactory(user=user).get_progress_details() == {
+        "total_lessons": 0,
+        "completed_lessons": 0,
+        "total_surveys": 0,
+        "completed_surveys": 0,
+        "progress_percent": 0,
+        "modules": [],
+    }
+
+
+def test_compute_progress_details_reads_cached_structure(
+    user_course, django_assert_num_queries
+):
+    user_course.compute_progress_details()
+
+    # только завершённые уроки и опросы, структура курса берётся из кэша
+    with django_assert_num_queries(2):
+        user_course.compute_progress_details()
+
+
+def test_with_progress_matches_compute_progress_details(user_course, user):
+    other_lesson = LessonFactory()
+    other_user_course = UserCourseFactory(user=user, course=other_lesson.module.course)
+
+    user_courses = UserCourse.objects.filter(user=user).with_progress()
+
+    assert {uc.pk: uc.compute_progress_details() for uc in user_courses} == {
+        user_course.pk: user_course.compute_progress_details(),
+        other_user_course.pk: other_user_course.compute_progress_details(),
+    }
+
+
+def test_with_progress_runs_single_query(
+    user_course, user, django_assert_num_queries
+):
+    UserCourseFactory.create_batch(3, user=user)
+
+    with django_assert_num_queries(1):
+        for uc in UserCourse.objects.filter(user=user).with_progress():
+            uc.get_progress_details()
+
+
+class TestUserCourseProgress:
+    def test_created_on_enroll(self, user, course):
+        user_course = UserCourseFactory(user=user, course=course)
+        first_module, second_module = course.modules.order_by("order", "pk")
+
+        assert user_course.progress.get_progress_details() == {
+            "total_lessons": 4,
+            "completed_lessons": 0,
+            "total_surveys": 3,
+            "completed_surveys": 0,
+            "progress_percent": 0,
+            "modules": [
+                module_details(first_module, 3, 0, 3, 0, 0),
+                module_details(second_module, 1, 0, 0, 0, 0),
+            ],
+        }
+
+    def test_updated_on_status_change(self, user_course):
+        user_course_survey = user_course.surveys.get(
+            status=UserCourseSurvey.STATUS_COMPLETED
+        )
+        user_course_survey.status = UserCourseSurvey.STATUS_COMPLETED_WITH_FAILS
+        user_course_survey.save()
+
+        user_course.progress.refresh_from_db()
+        assert user_course.progress.completed_surveys == 0
+        assert user_course.get_progress_details() == (
+            user_course.compute_progress_details()
+        )
+
+    def test_updated_on_course_structure_change(
+        self, user_course, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            lesson = LessonFactory(module=user_course.course.modules.first())
+            lesson.surveys.add(SurveyFactory())
+
+        user_course.progress.refresh_from_db()
+        assert user_course.progress.total_lessons == 5
+        assert user_course.progress.total_surveys == 4
+
+        with django_capture_on_commit_callbacks(execute=True):
+            lesson.surveys.clear()
+
+        user_course.progress.refresh_from_db()
+        assert user_course.progress.total_surveys == 3
+
+        with django_capture_on_commit_callbacks(execute=True):
+            lesson.delete()
+
+        user_course.progress.refresh_from_db()
+        assert user_course.get_progress_details() == (
+            user_course.compute_progress_details()
+        )
+
+    def test_refresh_task_runs_one_batch_at_a_time(
+        self, user_course, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        monkeypatch.setattr("courses.tasks.PROGRESS_REFRESH_BATCH_SIZE", 1)
+        other = UserCourseFactory(course=user_course.course)
+        runs = []
+        bumps: list[list[int]] = []
+        delay = refresh_course_progress_task.delay
+
+        def delay_next_batch(course_id, after=0):
+            runs.append(after)
+            return delay(course_id, after=after)
+
+        monkeypatch.setattr(refresh_course_progress_task, "delay", delay_next_batch)
+        monkeypatch.setattr("courses.tasks.bump_course_content_versions", bumps.append)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            LessonFactory(module=user_course.course.modules.first())
+
+        assert runs == [0, user_course.pk, other.pk]
+        # версия сбрасывается один раз, после последней пачки
+        assert bumps == [[user_course.course_id]]
+        assert set(
+            UserCourseProgress.objects.values_list("user_course_id", "total_lessons")
+        ) == {(user_course.pk, 5), (other.pk, 5)}
+
+    def test_rebuild_command(self, user_course):
+        UserCourseProgress.objects.all().delete()
+
+        with pytest.raises(CommandError):
+            call_command("rebuild_course_progress", "--verify", stdout=StringIO())
+
+        call_command("rebuild_course_progress", stdout=StringIO())
+        call_command("rebuild_course_progress", "--verify", stdout=StringIO())
+
+        assert UserCourseProgress.objects.get(
+            user_course=user_course
+        ).get_progress_details() == user_course.compute_progress_details()
+
+
+def test_bitmap_helpers():
+    bitmap = make_bitmap([0, 3, 9])
+
+    assert bitmap == bytes([0b1001, 0b10])
+    assert bitmap_positions(bitmap) == [0, 3, 9]
+
+
+class TestUserCourseProgressBitmaps:
+    def test_completed_lessons(self, user_course):
+        structure = get_course_structure(user_course.course_id)
+        progress = user_course.progress
+        first_lesson_id = next(iter(structure.lesson_positions))
+
+        assert progress.get_completed_lesson_ids(structure) == {first_lesson_id}
+
+    def test_stale_layout_is_refreshed(self, user_course):
+        UserCourseProgress.objects.filter(user_course=user_course).update(
+            bitmap_layout="stale", completed_lessons_bitmap=b""
+        )
+        structure = get_course_structure(user_course.course_id)
+        progress = UserCourseProgress.objects.get(user_course=user_course)
+
+        assert progress.get_completed_lesson_ids(structure) is None
+        progress = UserCourseProgress.objects.get_current(user_course, structure)
+        assert progress.get_completed_lesson_ids(structure) == {
+            next(iter(structure.lesson_positions))
+        }
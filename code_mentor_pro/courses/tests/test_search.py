@@ -0,0 +1,90 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from courses.models import Course, Material
+from courses.models.search import search_learning_content
+from courses.tests.factories import (CourseFactory, LessonFactory,
+                                     MaterialFactory, ModuleFactory)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalog():
+    asyncio_course = CourseFactory(
+        title="Асинхронное программирование",
+        slug="asyncio",
+        description="Событийный цикл и корутины.",
+        level=Course.LEVEL_ADVANCED,
+    )
+    basics_course = CourseFactory(
+        title="Основы Python",
+        slug="python-basics",
+        description="Переменные, циклы и немного асинхронного кода.",
+        level=Course.LEVEL_BEGINNER,
+    )
+    CourseFactory(title="Асинхронный черновик", slug="draft", is_published=False)
+    lesson = LessonFactory(
+        module=ModuleFactory(course=asyncio_course),
+        title="Корутины",
+        description="Асинхронные функции и await.",
+    )
+    MaterialFactory(
+        lesson=lesson, title="Документация asyncio", language=Material.LANGUAGE_ENG
+    )
+    MaterialFactory(
+        lesson=lesson, title="Статья про корутины", language=Material.LANGUAGE_RU
+    )
+    return asyncio_course, basics_course
+
+
+def test_search_ranks_title_matches_first(catalog, django_assert_num_queries):
+    asyncio_course, basics_course = catalog
+
+    with django_assert_num_queries(3) as queries:
+        results = search_learning_content("асинхронный")
+
+    assert [course["id"] for course in results["courses"]] == [
+        asyncio_course.pk,
+        basics_course.pk,
+    ]
+    assert [lesson["title"] for lesson in results["lessons"]] == ["Корутины"]
+    assert results["lessons"][0]["course_slug"] == asyncio_course.slug
+    assert all("@@" in query["sql"] for query in queries.captured_queries)
+    assert not any("LIKE" in query["sql"] for query in queries.captured_queries)
+
+
+def test_search_filters(catalog):
+    asyncio_course, basics_course = catalog
+
+    results = search_learning_content("асинхронный", level=Course.LEVEL_BEGINNER)
+    assert [course["id"] for course in results["courses"]] == [basics_course.pk]
+    assert results["lessons"] == []
+
+    results = search_learning_content("корутины", language=Material.LANGUAGE_RU)
+    assert [material["title"] for material in results["materials"]] == [
+        "Статья про корутины"
+    ]
+
+
+def test_search_vector_updated_on_save(catalog):
+    _, basics_course = catalog
+    basics_course.title = "Генераторы и итераторы"
+    basics_course.save()
+
+    results = search_learning_content("генераторы")
+
+    assert [course["id"] for course in results["courses"]] == [basics_course.pk]
+
+
+def test_search_view(catalog):
+    client = APIClient()
+    url = reverse("api:search")
+
+    response = client.get(url, {"q": "корутины", "level": Course.LEVEL_ADVANCED})
+    assert response.status_code == 200
+    assert len(response.data["materials"]) == 1
+
+    assert client.get(url).status_code == 400
+    assert client.get(url, {"q": "корутины", "level": "EXPERT"}).status_code == 400
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import (EVENT_MATERIAL_COMPLETED, Achievement,
+                            AchievementAwardJob, Lesson, UserAchievement,
+                            award_achievements)
+from courses.streaks import (ACTIVITY_EPOCH, ACTIVITY_KEY, calculate_streaks,
+                             get_day_offset, get_users_streaks)
+from courses.tests.factories import MaterialFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def make_activity(redis_client, user_id, days):
+    key = ACTIVITY_KEY.format(user_id=user_id)
+    for day in days:
+        redis_client.setbit(key, get_day_offset(day), 1)
+    return redis_client.get(key)
+
+
+@pytest.mark.parametrize(
+    ("today_offset", "expected"),
+    [
+        (8, {"current_streak": 4, "longest_streak": 4}),
+        # сегодня ещё не занимался — серия не прервана
+        (9, {"current_streak": 4, "longest_streak": 4}),
+        (10, {"current_streak": 0, "longest_streak": 4}),
+        (3, {"current_streak": 3, "longest_streak": 4}),
+    ],
+)
+def test_calculate_streaks(redis_client, today_offset, expected):
+    days = [ACTIVITY_EPOCH + timedelta(days=offset) for offset in (0, 1, 2, 5, 6, 7, 8)]
+    bitmap = make_activity(redis_client, 1, days)
+
+    today = ACTIVITY_EPOCH + timedelta(days=today_offset)
+    assert calculate_streaks(bitmap, today) == expected
+
+
+def test_calculate_streaks_without_activity():
+    assert calculate_streaks(None, timezone.localdate()) == {
+        "current_streak": 0,
+        "longest_streak": 0,
+    }
+
+
+def test_complete_material_records_activity(
+    user, course, django_capture_on_commit_callbacks
+):
+    lesson = Lesson.objects.filter(module__course=course).earliest("pk")
+    material = MaterialFactory(lesson=lesson)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            reverse(
+                "api:complete-material", args=[course.slug, lesson.pk, material.pk]
+            )
+        )
+
+    assert get_users_streaks([user.pk]) == {
+        user.pk: {"current_streak": 1, "longest_streak": 1}
+    }
+    response = client.get(reverse("api:user-streak"))
+    assert response.data == {"current_streak": 1, "longest_streak": 1}
+
+
+def test_streak_achievement_awarded(user, redis_client):
+    today = timezone.localdate()
+    make_activity(redis_client, user.pk, [today - timedelta(days=n) for n in range(7)])
+
+    awarded = award_achievements([user.pk], events=[EVENT_MATERIAL_COMPLETED])
+
+    assert [award.achievement.code for award in awarded] == [
+        Achievement.AchievementCode.STREAK_SEVEN_DAYS
+    ]
+
+
+def test_streak_achievement_activation_skips_retroactive_award(user):
+    achievement = Achievement.objects.get(
+        code=Achievement.AchievementCode.STREAK_SEVEN_DAYS
+    )
+    achievement.is_active = False
+    achievement.save()
+
+    achievement.is_active = True
+    achievement.save()
+
+    assert not AchievementAwardJob.objects.exists()
+    assert not UserAchievement.objects.exists()
@@ -0,0 +1,50 @@
+import pytest
+
+from courses.models import Lesson
+from courses.models.structure import get_course_structure
+from courses.tests.factories import LessonFactory, MaterialFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def test_get_course_structure(course):
+    lessons = list(
+        Lesson.objects.filter(module__course=course).order_by("module__order", "order")
+    )
+    material = MaterialFactory(lesson=lessons[0])
+
+    structure = get_course_structure(course.pk)
+
+    assert [module["id"] for module in structure.modules] == list(
+        course.modules.order_by("order").values_list("id", flat=True)
+    )
+    assert [lesson["id"] for lesson in structure.lessons] == [
+        lesson.id for lesson in lessons
+    ]
+    assert structure.get_lesson(lessons[0].id)["material_ids"] == [material.id]
+    assert structure.get_lesson(lessons[1].id)["survey_ids"] == sorted(
+        lessons[1].surveys.values_list("id", flat=True)
+    )
+
+
+def test_get_course_structure_is_cached(course, django_assert_num_queries):
+    get_course_structure(course.pk)
+
+    with django_assert_num_queries(0):
+        get_course_structure(course.pk)
+
+
+def test_get_course_structure_rebuilt_after_change(
+    course, django_capture_on_commit_callbacks
+):
+    get_course_structure(course.pk)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        lesson = LessonFactory(module=course.modules.first())
+
+    assert get_course_structure(course.pk).get_lesson(lesson.pk) is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        MaterialFactory(lesson=lesson)
+
+    assert get_course_structure(course.pk).get_lesson(lesson.pk)["material_ids"]